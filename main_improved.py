@@ -1,20 +1,56 @@
-import tkinter as tk
-from tkinter import ttk, scrolledtext, filedialog, messagebox
 import re
 import asyncio
 import random
 import time
+import importlib
+import itertools
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
-from playwright.async_api import async_playwright
-import aiohttp
-from tqdm import tqdm
 import os
 import json
-from typing import List, Dict, Any, Optional
+import csv
+import gzip
+import hashlib
+import sqlite3
+import struct
+import mmap
+import zlib
+import argparse
+import socket
+import threading
+import uuid
+import ipaddress
+from urllib.parse import urlparse
+from typing import List, Dict, Any, Optional, Iterator, Iterable, AsyncIterator, Tuple, Callable, Awaitable
 import logging
 
+
+class LazyModule:
+    """Importa o módulo apenas no primeiro acesso a um de seus atributos"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# Módulos pesados carregados sob demanda, para a interface abrir rapidamente
+# e os subcomandos de linha de comando não dependerem do Tkinter
+tk = LazyModule('tkinter')
+ttk = LazyModule('tkinter.ttk')
+scrolledtext = LazyModule('tkinter.scrolledtext')
+filedialog = LazyModule('tkinter.filedialog')
+messagebox = LazyModule('tkinter.messagebox')
+bs4 = LazyModule('bs4')
+playwright_api = LazyModule('playwright.async_api')
+tqdm = LazyModule('tqdm')
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,56 +61,1801 @@ logging.basicConfig(
     ]
 )
 
+CONTRACT_PATTERN = re.compile(r'^\d{4,6}$')
+HOST_LABEL_PATTERN = re.compile(r'^(?!-)[\w-]{1,63}(?<!-)$')
+CSV_INPUT_COLUMNS = ('url', 'contrato')
+
+# Lê o innerText da página em blocos de linhas não vazias; o filtro de linhas é
+# aplicado em Python, para valer a mesma sintaxe de regex online e offline.
+# As linhas ficam guardadas na página entre as chamadas para não recalcular o texto.
+TEXT_CHUNK_SCRIPT = '''
+({offset, limit}) => {
+    if (offset === 0 || !window.__scraperLines) {
+        window.__scraperLines = document.body.innerText.split('\\n')
+            .map(line => line.trim())
+            .filter(line => line);
+    }
+    const lines = window.__scraperLines.slice(offset, offset + limit);
+    if (offset + limit >= window.__scraperLines.length) {
+        delete window.__scraperLines;
+    }
+    return lines;
+}
+'''
+
+
+def compile_line_filter(pattern: Optional[str]):
+    """Compila o filtro de linhas da busca livre (regex Python, sem diferenciar maiúsculas)"""
+    return re.compile(pattern, re.IGNORECASE) if pattern else None
+
+
+def is_valid_host(host: str, require_domain: bool = False) -> bool:
+    """Verifica se o host é um nome válido ou endereço IP
+
+    Com ``require_domain``, nomes sem ponto (exceto localhost) são recusados.
+    """
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        pass
+    labels = host.rstrip('.').split('.')
+    if not all(HOST_LABEL_PATTERN.match(label) for label in labels):
+        return False
+    return not require_domain or len(labels) > 1 or host == 'localhost'
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Normaliza uma URL, retornando None se ela for inválida
+
+    Com http(s):// explícito, aceita qualquer host válido (inclusive nomes de
+    intranet como ``crm01``). Sem esquema, exige domínio com ponto, localhost,
+    IP ou porta explícita, para não transformar palavras soltas em URLs.
+    """
+    url = url.strip()
+    if not url or any(c.isspace() for c in url):
+        return None
+    has_scheme = url.startswith(('http://', 'https://'))
+    if not has_scheme:
+        url = f'https://{url}'
+    try:
+        parsed = urlparse(url)
+        host, port = parsed.hostname, parsed.port
+    except ValueError:
+        return None
+    if not host or not is_valid_host(host, require_domain=not has_scheme and port is None):
+        return None
+    return url
+
+
+class InputLoader:
+    """Lê URLs ou números de contrato de arquivos grandes sob demanda"""
+
+    def __init__(self, path: str, mode: str = 'url_only', url_base: str = ''):
+        self.path = path
+        self.mode = mode
+        self.url_base = url_base.strip()
+        self.invalid = 0
+        self.duplicates = 0
+        self.accepted = 0
+
+    def _open(self):
+        """Abre o arquivo em modo texto, descompactando .gz se necessário"""
+        if self.path.lower().endswith('.gz'):
+            return gzip.open(self.path, 'rt', encoding='utf-8', errors='replace', newline='')
+        return open(self.path, 'r', encoding='utf-8', errors='replace', newline='')
+
+    def _iter_csv(self, file) -> Iterator[str]:
+        """Gera os itens de uma única coluna do CSV, ignorando o cabeçalho
+
+        Usa a coluna chamada url/contrato, se houver cabeçalho, ou a primeira.
+        """
+        reader = csv.reader(file)
+        first = next(reader, None)
+        if first is None:
+            return
+        names = [cell.strip().lower() for cell in first]
+        column = next((i for i, name in enumerate(names) if name in CSV_INPUT_COLUMNS), None)
+        if column is None:
+            column = 0
+            # Sem nome conhecido: a primeira linha só é cabeçalho se não for um item válido
+            if first and self._validate(first[0].strip()) is not None:
+                yield first[0]
+        for row in reader:
+            if len(row) > column:
+                yield row[column]
+
+    def _iter_raw(self) -> Iterator[str]:
+        """Gera os itens brutos do arquivo, linha a linha"""
+        is_csv = self.path.lower().endswith(('.csv', '.csv.gz'))
+        with self._open() as file:
+            if is_csv:
+                yield from self._iter_csv(file)
+            else:
+                for line in file:
+                    # Números de contrato podem vir separados por vírgula
+                    if self.mode == 'url_contract':
+                        yield from line.split(',')
+                    else:
+                        yield line
+
+    def _validate(self, item: str) -> Optional[str]:
+        """Valida o item e retorna a URL final a ser processada"""
+        if self.mode == 'url_contract':
+            if not CONTRACT_PATTERN.match(item):
+                return None
+            return normalize_url(f"{self.url_base}{item}")
+        return normalize_url(item)
+
+    def __iter__(self) -> Iterator[str]:
+        # Guardar apenas um digest curto por item para limitar o uso de memória
+        seen = set()
+        for item in self._iter_raw():
+            item = item.strip()
+            if not item:
+                continue
+            url = self._validate(item)
+            if url is None:
+                self.invalid += 1
+                continue
+            key = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+            if key in seen:
+                self.duplicates += 1
+                continue
+            seen.add(key)
+            self.accepted += 1
+            yield url
+
+    def summary(self) -> str:
+        """Resumo da leitura do arquivo"""
+        return (f"{self.accepted} itens lidos de {os.path.basename(self.path)} "
+                f"({self.invalid} inválidos, {self.duplicates} duplicados ignorados)")
+
+
+class SessionPool:
+    """Pool de contextos autenticados por host, com sessão salva em disco
+
+    O storage state (cookies/localStorage) de cada host é salvo em
+    ``<storage_dir>/<host>.json`` e reaproveitado na próxima execução. Hosts
+    listados em ``<storage_dir>/logins.json`` fazem login automaticamente
+    quando a sessão expira, por exemplo::
+
+        {"crm.exemplo.com.br": {
+            "login_url": "https://crm.exemplo.com.br/login",
+            "username_selector": "#usuario",
+            "password_selector": "#senha",
+            "submit_selector": "button[type=submit]",
+            "username_env": "CRM_USUARIO",
+            "password_env": "CRM_SENHA",
+            "logged_out_selector": "input[type=password]"}}
+    """
+
+    def __init__(self, context_factory, storage_dir: str = 'sessoes', contexts_per_host: int = 2):
+        self.context_factory = context_factory
+        self.storage_dir = storage_dir
+        self.contexts_per_host = max(1, contexts_per_host)
+        self.contexts: Dict[str, List[Any]] = {}
+        self.cursor: Dict[str, int] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.generation: Dict[str, int] = {}
+        os.makedirs(storage_dir, exist_ok=True)
+        self.logins = self._load_logins()
+
+    def _load_logins(self) -> Dict[str, Dict[str, str]]:
+        """Carrega as configurações de login por host"""
+        path = os.path.join(self.storage_dir, 'logins.json')
+        if not os.path.exists(path):
+            return {}
+        try:
+            # Credenciais podem vir de um arquivo .env
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _state_path(self, host: str) -> str:
+        return os.path.join(self.storage_dir, f"{host.replace(':', '_')}.json")
+
+    def _lock(self, host: str) -> asyncio.Lock:
+        if host not in self.locks:
+            self.locks[host] = asyncio.Lock()
+        return self.locks[host]
+
+    async def _get_contexts(self, host: str) -> List[Any]:
+        """Cria (uma única vez) os contextos do host a partir da sessão salva"""
+        async with self._lock(host):
+            if host not in self.contexts:
+                path = self._state_path(host)
+                state = path if os.path.exists(path) else None
+                if state:
+                    logging.info(f"Reutilizando sessão salva para {host}")
+                self.contexts[host] = [await self.context_factory(state)
+                                       for _ in range(self.contexts_per_host)]
+                self.cursor[host] = 0
+        return self.contexts[host]
+
+    async def new_page(self, url: str):
+        """Abre uma página em um dos contextos compartilhados do host"""
+        host = urlparse(url).netloc
+        contexts = await self._get_contexts(host)
+        context = contexts[self.cursor[host] % len(contexts)]
+        self.cursor[host] += 1
+        return await context.new_page()
+
+    async def _is_logged_out(self, page, login: Dict[str, str]) -> bool:
+        """Verifica se a página foi redirecionada para o login"""
+        login_url = login.get('login_url', '').split('?')[0]
+        if login_url and page.url.split('?')[0] == login_url:
+            return True
+        selector = login.get('logged_out_selector')
+        return bool(selector and await page.query_selector(selector))
+
+    async def _login(self, page, host: str, login: Dict[str, str]):
+        """Executa o login com as credenciais das variáveis de ambiente"""
+        username = os.environ.get(login.get('username_env', ''))
+        password = os.environ.get(login.get('password_env', ''))
+        if not username or not password:
+            raise RuntimeError(f"Credenciais ausentes para {host}")
+
+        logging.info(f"Sessão expirada em {host}, fazendo login novamente")
+        await page.goto(login['login_url'], wait_until='networkidle', timeout=60000)
+        await page.fill(login['username_selector'], username)
+        await page.fill(login['password_selector'], password)
+        await page.click(login['submit_selector'])
+        await page.wait_for_load_state('networkidle')
+        if await self._is_logged_out(page, login):
+            raise RuntimeError(f"Falha no login em {host}")
+
+    async def ensure_session(self, page, url: str) -> bool:
+        """Refaz o login se a sessão expirou; retorna True se a página deve ser recarregada"""
+        host = urlparse(url).netloc
+        login = self.logins.get(host)
+        if not login or not await self._is_logged_out(page, login):
+            return False
+
+        generation = self.generation.get(host, 0)
+        async with self._lock(host):
+            # Outra página pode ter renovado a sessão enquanto esperávamos
+            if self.generation.get(host, 0) == generation:
+                await self._login(page, host, login)
+                state = await page.context.storage_state(path=self._state_path(host))
+                for context in self.contexts.get(host, []):
+                    if context is not page.context:
+                        await context.add_cookies(state['cookies'])
+                self.generation[host] = generation + 1
+        return True
+
+    async def save(self):
+        """Salva a sessão atual de cada host (inclusive logins feitos manualmente)"""
+        for host, contexts in self.contexts.items():
+            try:
+                await contexts[0].storage_state(path=self._state_path(host))
+            except Exception as e:
+                logging.error(f"Erro ao salvar sessão de {host}: {str(e)}")
+
+    async def close(self):
+        """Salva as sessões e fecha os contextos do pool"""
+        await self.save()
+        for contexts in self.contexts.values():
+            for context in contexts:
+                await context.close()
+        self.contexts.clear()
+
+
+# Seletores genéricos por campo, usados quando o host não tem perfil próprio
+DEFAULT_SELECTORS = {
+    'cod': ['text="COD" i', 'text="CÓD" i', 'text="BANCO" i', '[id*="cod" i]', '[class*="cod" i]'],
+    'nome': ['text="NOME" i', 'text="CLIENTE" i', '[id*="nome" i]', '[class*="nome" i]'],
+    'cpf': ['text="CPF" i', 'text="DOCUMENTO" i', '[id*="cpf" i]', '[class*="cpf" i]'],
+    'acordo': ['text="ACORDO" i', 'text="CONTRATO" i', '[id*="acordo" i]', '[class*="acordo" i]'],
+}
+
+
+def count_fields(texts: Iterable[str]) -> int:
+    """Quantos textos têm o formato ``rótulo: valor`` com o valor preenchido"""
+    return sum(1 for text in texts if ':' in text and text.split(':', 1)[1].strip())
+
+
+class ExtractionProfiles:
+    """Perfis de extração por host, com aprendizado dos seletores que funcionam
+
+    O perfil (``perfis_extracao.json`` ou ``.yaml``) lista, por host e campo,
+    seletores CSS ou ``xpath=...`` precisos::
+
+        {"crm.exemplo.com.br": {"cpf": ["#cpfCliente"],
+                                "cod": ["xpath=//td[.='Cód. Banco']/following-sibling::td"]}}
+
+    Cada plano de extração é compilado uma vez por host: seletor aprendido,
+    seletores do perfil e, por último, o seletor genérico do campo. Um seletor
+    só ganha crédito quando extrai campos ``rótulo: valor`` (do seletor
+    genérico, conta a parte que extraiu mais campos) e perde um crédito
+    quando falha; com ``promote_after`` créditos passa a ser consultado primeiro.
+    """
+
+    def __init__(self, path: str = 'perfis_extracao.json',
+                 learned_path: str = 'seletores_aprendidos.json', promote_after: int = 3):
+        self.learned_path = learned_path
+        self.promote_after = promote_after
+        self.profiles = self._load_profiles(path)
+        self.learned: Dict[str, Dict[str, Dict[str, int]]] = {}
+        if os.path.exists(learned_path):
+            with open(learned_path, 'r', encoding='utf-8') as f:
+                self.learned = json.load(f)
+        self.plans: Dict[str, Dict[str, List[str]]] = {}
+
+    @staticmethod
+    def _load_profiles(path: str) -> Dict[str, Dict[str, List[str]]]:
+        """Carrega o perfil em JSON, ou em YAML se o PyYAML estiver instalado"""
+        base = os.path.splitext(path)[0]
+        for candidate in (path, f'{base}.yaml', f'{base}.yml'):
+            if not os.path.exists(candidate):
+                continue
+            with open(candidate, 'r', encoding='utf-8') as f:
+                if candidate.endswith(('.yaml', '.yml')):
+                    try:
+                        import yaml
+                    except ImportError:
+                        logging.warning(f"PyYAML não instalado, perfil ignorado: {candidate}")
+                        continue
+                    return yaml.safe_load(f) or {}
+                return json.load(f)
+        return {}
+
+    def _promoted(self, host: str, field: str) -> Optional[str]:
+        hits = self.learned.get(host, {}).get(field, {})
+        if not hits:
+            return None
+        selector, count = max(hits.items(), key=lambda item: item[1])
+        return selector if count >= self.promote_after else None
+
+    def plan(self, host: str) -> Dict[str, List[str]]:
+        """Plano de extração do host: seletores por campo, na ordem de consulta"""
+        if host not in self.plans:
+            plan = {}
+            for field, generic in DEFAULT_SELECTORS.items():
+                selectors = []
+                promoted = self._promoted(host, field)
+                if promoted:
+                    selectors.append(promoted)
+                for selector in self.profiles.get(host, {}).get(field, []):
+                    if selector not in selectors:
+                        selectors.append(selector)
+                selectors.append(', '.join(generic))
+                plan[field] = selectors
+            self.plans[host] = plan
+        return self.plans[host]
+
+    def is_generic(self, field: str, selector: str) -> bool:
+        return selector == ', '.join(DEFAULT_SELECTORS[field])
+
+    def record_hit(self, host: str, field: str, selector: str):
+        """Conta um acerto do seletor; recompila o plano quando ele é promovido"""
+        hits = self.learned.setdefault(host, {}).setdefault(field, {})
+        hits[selector] = hits.get(selector, 0) + 1
+        if hits[selector] == self.promote_after:
+            logging.info(f"Seletor promovido para {field} em {host}: {selector}")
+            self.plans.pop(host, None)
+
+    def record_miss(self, host: str, field: str, selector: str):
+        """Desconta um acerto do seletor; rebaixa-o quando fica abaixo de promote_after"""
+        hits = self.learned.get(host, {}).get(field, {})
+        count = hits.get(selector, 0)
+        if not count:
+            return
+        if count > 1:
+            hits[selector] = count - 1
+        else:
+            del hits[selector]
+        if count == self.promote_after:
+            logging.info(f"Seletor rebaixado para {field} em {host}: {selector}")
+            self.plans.pop(host, None)
+
+    def save(self):
+        """Salva os seletores aprendidos"""
+        if not self.learned:
+            return
+        with open(self.learned_path, 'w', encoding='utf-8') as f:
+            json.dump(self.learned, f, ensure_ascii=False, indent=2)
+
+
+TEXT_SELECTOR = re.compile(r'^text="(.*)"( i)?$')
+HIDDEN_STYLE = re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden', re.IGNORECASE)
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template', 'head', 'title'}
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'caption', 'dd', 'details', 'dialog', 'div',
+    'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'summary',
+    'table', 'tbody', 'tfoot', 'thead', 'tr', 'ul'
+}
+
+
+def element_text(element) -> str:
+    """Texto visível de um elemento do BeautifulSoup, aproximando o innerText do navegador
+
+    Ignora scripts, estilos e elementos ocultos, quebra linha entre blocos e
+    separa células de tabela com tabulação, como o navegador faz.
+    """
+    parts = []
+    
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, bs4.element.NavigableString):
+                if not isinstance(child, bs4.element.PreformattedString):
+                    parts.append(re.sub(r'\s+', ' ', str(child)))
+                continue
+            name = child.name
+            if name in SKIPPED_TAGS or child.has_attr('hidden') or HIDDEN_STYLE.search(child.get('style', '')):
+                continue
+            if name == 'br':
+                parts.append('\n')
+                continue
+            if name in ('td', 'th'):
+                parts.append('\t')
+            block = name in BLOCK_TAGS
+            if block:
+                parts.append('\n')
+            walk(child)
+            if block:
+                parts.append('\n')
+    
+    walk(element)
+    lines = (re.sub(r' *\t *', '\t', line).strip(' \t') for line in ''.join(parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def select_elements(soup, html: str, selector: str) -> List[Tuple[str, str]]:
+    """Aplica um seletor do plano ao HTML e retorna (texto, html interno) de cada elemento
+
+    Entende os mesmos formatos usados com o Playwright: CSS, ``text="..." i``
+    (texto exato) e ``xpath=...`` (este último só com o lxml instalado).
+    """
+    text_match = TEXT_SELECTOR.match(selector)
+    if text_match:
+        term, ignore_case = text_match.group(1), bool(text_match.group(2))
+        if ignore_case:
+            term = term.lower()
+        found = []
+        for node in soup.find_all(string=True):
+            text = ' '.join(node.split())
+            if (text.lower() if ignore_case else text) == term and node.parent is not None:
+                found.append((element_text(node.parent), node.parent.decode_contents()))
+        return found
+    
+    if selector.startswith('xpath='):
+        try:
+            import lxml.html
+        except ImportError:
+            logging.warning(f"lxml não instalado, seletor ignorado: {selector}")
+            return []
+        found = []
+        for el in lxml.html.fromstring(html).xpath(selector[len('xpath='):]):
+            if isinstance(el, str):
+                continue
+            # Reinterpretar com o BeautifulSoup para o texto sair igual ao dos seletores CSS
+            tag = bs4.BeautifulSoup(lxml.html.tostring(el, encoding='unicode'), 'html.parser').find()
+            found.append((element_text(tag), tag.decode_contents()))
+        return found
+    
+    return [(element_text(el), el.decode_contents()) for el in soup.select(selector)]
+
+
+def extract_results(url: str, html: str, lines: List[str], search_params: Dict[str, Any],
+                    plan: Dict[str, List[str]]) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """Extrai os resultados de uma página já baixada, sem navegador
+
+    Segue a mesma lógica de ``WebScraper.search_page`` e pode rodar em outro
+    processo. Retorna os resultados, os pares (campo, seletor) que extraíram
+    campos ``rótulo: valor`` e os que falharam, para o aprendizado dos perfis
+    de extração.
+    """
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    results = []
+    hits = []
+    misses = []
+    
+    def search_text(selectors: List[str], text_type: str, search_term: str = None):
+        elements = []
+        for selector in selectors:
+            # O seletor genérico combina vários; aplicar cada parte separadamente
+            parts = [selector]
+            if text_type in DEFAULT_SELECTORS and selector == ', '.join(DEFAULT_SELECTORS[text_type]):
+                parts = DEFAULT_SELECTORS[text_type]
+            best_part, best_fields = None, 0
+            for part in parts:
+                try:
+                    found = select_elements(soup, html, part)
+                except Exception as e:
+                    logging.warning(f"Seletor inválido para {text_type} ({part}): {str(e)}")
+                    continue
+                fields = count_fields(text for text, _ in found)
+                if fields > best_fields:
+                    best_part, best_fields = part, fields
+                elements.extend(found)
+            if best_part:
+                hits.append((text_type, best_part))
+            elif len(parts) == 1 and text_type in plan:
+                misses.append((text_type, selector))
+            if elements:
+                break
+        
+        if not elements:
+            for tag in soup.find_all(text=True):
+                if search_term and search_term.lower() not in tag.lower():
+                    continue
+                results.append({'type': text_type, 'text': tag.strip(), 'url': url})
+            return
+        
+        for text, inner_html in elements:
+            if ':' in text:
+                label, value = text.split(':', 1)
+                results.append({
+                    'type': text_type,
+                    'label': label.strip(),
+                    'value': value.strip(),
+                    'full_text': text.strip(),
+                    'html': inner_html,
+                    'url': url
+                })
+            else:
+                results.append({
+                    'type': text_type,
+                    'text': text.strip(),
+                    'html': inner_html,
+                    'url': url
+                })
+    
+    for field in ('cod', 'nome', 'cpf', 'acordo'):
+        if search_params.get(field, False):
+            search_text(plan[field], field)
+    
+    if search_params.get('custom', False) and search_params.get('custom_terms'):
+        for term in search_params['custom_terms']:
+            term = term.strip()
+            if term:
+                search_text(['*'], 'custom', term)
+    
+    if search_params.get('free_search', False):
+        for line in lines:
+            results.append({'type': 'free_search', 'text': line, 'url': url})
+    
+    # Remover duplicatas mantendo a ordem
+    seen = set()
+    unique_results = []
+    for r in results:
+        key = (r.get('type'), r.get('text', ''), r.get('full_text', ''))
+        if key not in seen:
+            seen.add(key)
+            unique_results.append(r)
+    return unique_results, hits, misses
+
+
+def reextract_snapshot(job: Tuple[Dict[str, Any], Dict[str, Any], Dict[str, List[str]]]) -> List[Dict[str, Any]]:
+    """Reextrai um snapshot guardado (executado no pool de processos)"""
+    snapshot, search_params, plan = job
+    regex = compile_line_filter(search_params.get('free_search_filter'))
+    lines = []
+    if search_params.get('free_search', False):
+        for line in snapshot['text'].split('\n'):
+            line = line.strip()
+            if line and (regex is None or regex.search(line)):
+                lines.append(line)
+    results, _, _ = extract_results(snapshot['url'], snapshot['html'], lines, search_params, plan)
+    return results
+
+
+class SnapshotStore:
+    """Arquivo compactado de snapshots das páginas, para reextração offline
+
+    ``dados.bin`` guarda os snapshots (HTML + texto visível) compactados, em
+    modo append-only e endereçados pelo conteúdo (HTML + texto, sem a URL): um
+    snapshot idêntico a outro já guardado, mesmo de outra URL, só ganha um novo
+    registro no índice. ``indice.bin`` tem registros de tamanho fixo, lidos via
+    mmap, e ``urls.jsonl`` associa o hash de cada URL ao endereço completo. A compactação usa zstd com
+    dicionário compartilhado (pacote ``zstandard``) ou, sem ele, zlib com
+    dicionário predefinido; o dicionário é treinado com os primeiros snapshots.
+    Um único processo deve gravar em cada arquivo.
+    """
+
+    # hash da URL, hash do conteúdo, offset, tamanho, codec, data
+    RECORD = struct.Struct('<16s16sQIBd')
+    ZLIB, ZLIB_DICT, ZSTD, ZSTD_DICT = 0, 1, 2, 3
+
+    def __init__(self, root: str = 'snapshots', train_after: int = 50, dict_size: int = 64 * 1024):
+        self.root = root
+        self.train_after = train_after
+        self.dict_size = dict_size
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.data_path = os.path.join(root, 'dados.bin')
+        self.index_path = os.path.join(root, 'indice.bin')
+        self.urls_path = os.path.join(root, 'urls.jsonl')
+        try:
+            import zstandard
+            self.zstd = zstandard
+        except ImportError:
+            self.zstd = None
+        # Um dicionário por compactador, para ler arquivos gravados com ou sem zstandard
+        self.dictionaries: Dict[str, bytes] = {}
+        for name in ('zstd', 'zlib'):
+            path = os.path.join(root, f'dicionario.{name}')
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    self.dictionaries[name] = f.read()
+        self.codec_name = 'zstd' if self.zstd else 'zlib'
+        self.samples: List[bytes] = []
+        # Compactador/descompactador zstd com dicionário, criados uma vez só
+        self.zstd_compressor = None
+        self.zstd_decompressor = None
+        # Conteúdo já guardado: hash -> (offset, tamanho, codec)
+        self.blobs: Dict[bytes, Tuple[int, int, int]] = {}
+        for _, content_key, offset, length, codec, _ in self._records():
+            self.blobs[content_key] = (offset, length, codec)
+        self.urls = self._load_urls()
+
+    def _load_urls(self) -> Dict[bytes, str]:
+        """Lê a tabela hash da URL -> URL"""
+        urls = {}
+        if os.path.exists(self.urls_path):
+            with open(self.urls_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    urls[bytes.fromhex(entry['key'])] = entry['url']
+        return urls
+
+    def _records(self) -> Iterator[Tuple]:
+        """Percorre o índice via mmap"""
+        if not os.path.exists(self.index_path) or os.path.getsize(self.index_path) == 0:
+            return
+        with open(self.index_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                for position in range(0, len(index) - self.RECORD.size + 1, self.RECORD.size):
+                    yield self.RECORD.unpack_from(index, position)
+
+    def _train(self):
+        """Cria o dicionário compartilhado a partir dos snapshots de amostra"""
+        samples, self.samples = self.samples, []
+        if self.zstd:
+            try:
+                dictionary = self.zstd.train_dictionary(self.dict_size, samples).as_bytes()
+            except Exception as e:
+                logging.warning(f"Não foi possível treinar o dicionário zstd: {str(e)}")
+                return
+        else:
+            # O zlib aproveita no máximo 32 KB de dicionário. Cada amostra contribui
+            # com um trecho diferente do HTML, em sequência, para o dicionário ter
+            # uma cópia do modelo das páginas e não o mesmo começo repetido
+            piece = max(1, 32 * 1024 // len(samples))
+            pieces = []
+            for i, sample in enumerate(samples):
+                html_start = max(sample.find(b'"html"'), 0)
+                start = html_start + (i * piece) % max(len(sample) - html_start, 1)
+                pieces.append(sample[start:start + piece])
+            dictionary = b''.join(pieces)[:32 * 1024]
+        path = os.path.join(self.root, f'dicionario.{self.codec_name}')
+        with open(path, 'wb') as f:
+            f.write(dictionary)
+        self.dictionaries[self.codec_name] = dictionary
+        logging.info(f"Dicionário de compactação criado em {path}")
+
+    def _compress(self, payload: bytes) -> Tuple[bytes, int]:
+        dictionary = self.dictionaries.get(self.codec_name)
+        if dictionary is None:
+            self.samples.append(payload)
+            if len(self.samples) >= self.train_after:
+                self._train()
+        if self.zstd:
+            if dictionary:
+                if self.zstd_compressor is None:
+                    self.zstd_compressor = self.zstd.ZstdCompressor(
+                        level=9, dict_data=self.zstd.ZstdCompressionDict(dictionary))
+                return self.zstd_compressor.compress(payload), self.ZSTD_DICT
+            return self.zstd.ZstdCompressor(level=9).compress(payload), self.ZSTD
+        if dictionary:
+            compressor = zlib.compressobj(9, zdict=dictionary)
+            return compressor.compress(payload) + compressor.flush(), self.ZLIB_DICT
+        return zlib.compress(payload, 9), self.ZLIB
+
+    def _decompress(self, data: bytes, codec: int) -> bytes:
+        if codec == self.ZLIB:
+            return zlib.decompress(data)
+        if codec == self.ZLIB_DICT:
+            decompressor = zlib.decompressobj(zdict=self.dictionaries['zlib'])
+            return decompressor.decompress(data) + decompressor.flush()
+        if self.zstd is None:
+            raise RuntimeError("Snapshot compactado com zstd; instale o pacote 'zstandard'")
+        if codec == self.ZSTD_DICT:
+            if self.zstd_decompressor is None:
+                self.zstd_decompressor = self.zstd.ZstdDecompressor(
+                    dict_data=self.zstd.ZstdCompressionDict(self.dictionaries['zstd']))
+            return self.zstd_decompressor.decompress(data)
+        return self.zstd.ZstdDecompressor().decompress(data)
+
+    def add(self, url: str, html: str, text: str):
+        """Guarda o snapshot da página"""
+        payload = json.dumps({'html': html, 'text': text}, ensure_ascii=False).encode('utf-8')
+        content_key = hashlib.sha256(payload).digest()[:16]
+        url_key = hashlib.sha256(url.encode('utf-8')).digest()[:16]
+        with self.lock:
+            if url_key not in self.urls:
+                with open(self.urls_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': url_key.hex(), 'url': url}, ensure_ascii=False) + '\n')
+                self.urls[url_key] = url
+            if content_key not in self.blobs:
+                data, codec = self._compress(payload)
+                with open(self.data_path, 'ab') as f:
+                    offset = f.tell()
+                    f.write(data)
+                self.blobs[content_key] = (offset, len(data), codec)
+            offset, length, codec = self.blobs[content_key]
+            with open(self.index_path, 'ab') as f:
+                f.write(self.RECORD.pack(url_key, content_key, offset, length, codec, time.time()))
+
+    def iter_latest(self) -> Iterator[Dict[str, Any]]:
+        """Gera o snapshot mais recente de cada URL"""
+        latest: Dict[bytes, Tuple[int, int, int]] = {}
+        for url_key, _, offset, length, codec, _ in self._records():
+            latest[url_key] = (offset, length, codec)
+        if not latest:
+            return
+        with open(self.data_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for url_key, (offset, length, codec) in latest.items():
+                    snapshot = json.loads(self._decompress(data[offset:offset + length], codec))
+                    # Snapshots gravados antes da tabela de URLs trazem a URL no conteúdo
+                    snapshot.setdefault('url', self.urls.get(url_key))
+                    yield snapshot
+
+    def __len__(self) -> int:
+        if not os.path.exists(self.index_path):
+            return 0
+        return os.path.getsize(self.index_path) // self.RECORD.size
+
+
+class FingerprintStore:
+    """Guarda a impressão digital de cada URL para o modo incremental"""
+
+    def __init__(self, path: str = 'impressoes.db'):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            'url TEXT PRIMARY KEY, page_hash TEXT NOT NULL, '
+            'fields TEXT NOT NULL, updated_at TEXT NOT NULL)'
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def page_digest(search_params: Dict[str, Any]):
+        """Inicia a impressão da página; muda também quando os filtros de busca mudam
+
+        O texto visível é acrescentado linha a linha com ``update``.
+        """
+        params = {k: v for k, v in search_params.items() if k != 'incremental'}
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        digest.update(b'\0')
+        return digest
+
+    def is_unchanged(self, url: str, page_hash: str) -> bool:
+        """Verifica se a página é idêntica à da última execução"""
+        row = self.conn.execute('SELECT page_hash FROM fingerprints WHERE url = ?', (url,)).fetchone()
+        return row is not None and row[0] == page_hash
+
+    @staticmethod
+    def _fields(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Indexa os resultados por campo (tipo + rótulo ou texto)"""
+        fields = {}
+        occurrences: Dict[tuple, int] = {}
+        for r in results:
+            if 'label' in r:
+                # O mesmo rótulo pode aparecer mais de uma vez na página
+                ident = (r.get('type'), r['label'])
+                n = occurrences.get(ident, 0)
+                occurrences[ident] = n + 1
+                key = json.dumps([r.get('type'), r['label'], n], ensure_ascii=False)
+            else:
+                key = json.dumps([r.get('type'), r.get('text', '')], ensure_ascii=False)
+            fields[key] = r
+        return fields
+
+    @staticmethod
+    def _group(keys: Iterable[str]) -> Dict[tuple, List[str]]:
+        """Agrupa as chaves de campos rotulados por (tipo, rótulo), na ordem da página"""
+        groups: Dict[tuple, List[str]] = {}
+        for key in keys:
+            ident = json.loads(key)
+            if len(ident) == 3:
+                groups.setdefault((ident[0], ident[1]), []).append(key)
+        for group in groups.values():
+            group.sort(key=lambda k: json.loads(k)[2])
+        return groups
+
+    def diff(self, url: str, page_hash: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Compara com a última execução e retorna apenas campos novos, alterados ou removidos
+
+        Campos de texto só podem ser novos ou removidos. Campos rotulados são
+        comparados por posição quando o rótulo aparece o mesmo número de vezes;
+        senão, pelos valores, para que uma ocorrência a mais ou a menos de um
+        rótulo repetido não faça as seguintes parecerem alteradas.
+        """
+        row = self.conn.execute('SELECT fields FROM fingerprints WHERE url = ?', (url,)).fetchone()
+        previous = json.loads(row[0]) if row else {}
+        current = self._fields(results)
+
+        changes = []
+        for key, r in current.items():
+            if 'label' not in r and key not in previous:
+                changes.append({**r, 'change': 'new'})
+        for key in previous:
+            ident = json.loads(key)
+            if len(ident) == 2 and key not in current:
+                changes.append({'type': ident[0], 'text': ident[1], 'url': url, 'change': 'removed'})
+
+        previous_groups = self._group(previous)
+        current_groups = self._group(current)
+        for ident in list(current_groups) + [i for i in previous_groups if i not in current_groups]:
+            old_keys = previous_groups.get(ident, [])
+            new_keys = current_groups.get(ident, [])
+            if len(old_keys) == len(new_keys):
+                for old_key, new_key in zip(old_keys, new_keys):
+                    r = current[new_key]
+                    if previous[old_key] != r.get('value'):
+                        changes.append({**r, 'change': 'changed', 'previous_value': previous[old_key]})
+                continue
+            unmatched = [previous[k] for k in old_keys]
+            for new_key in new_keys:
+                r = current[new_key]
+                if r.get('value') in unmatched:
+                    unmatched.remove(r.get('value'))
+                else:
+                    changes.append({**r, 'change': 'new'})
+            for value in unmatched:
+                changes.append({'type': ident[0], 'label': ident[1], 'url': url,
+                                'change': 'removed', 'previous_value': value})
+
+        fields = {key: r.get('value') for key, r in current.items()}
+        self.conn.execute(
+            'INSERT OR REPLACE INTO fingerprints (url, page_hash, fields, updated_at) VALUES (?, ?, ?, ?)',
+            (url, page_hash, json.dumps(fields, ensure_ascii=False), datetime.now().isoformat())
+        )
+        self.conn.commit()
+        return changes
+
+    def close(self):
+        self.conn.close()
+
+
+class ResultStore:
+    """Armazena os resultados de todas as execuções em SQLite indexado"""
+
+    def __init__(self, path: str = 'resultados.db'):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, started_at TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL,
+                url TEXT NOT NULL, host TEXT NOT NULL, type TEXT,
+                label TEXT, value TEXT, text TEXT, change TEXT,
+                created_at TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_results_type ON results (type);
+            CREATE INDEX IF NOT EXISTS idx_results_label ON results (label COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS idx_results_url ON results (url);
+            CREATE INDEX IF NOT EXISTS idx_results_host ON results (host, type);
+        ''')
+        # Busca textual com FTS5, se o SQLite local tiver suporte
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5("
+                "label, value, text, content='results', content_rowid='id')"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            logging.warning("SQLite sem FTS5; busca textual usará LIKE")
+            self.fts = False
+        self.conn.commit()
+
+    def start_run(self) -> int:
+        """Registra uma nova execução e retorna seu id"""
+        cursor = self.conn.execute('INSERT INTO runs (started_at) VALUES (?)', (datetime.now().isoformat(),))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def add(self, run_id: int, results: List[Dict[str, Any]]):
+        """Grava os resultados de uma página (resultados de erro são ignorados)"""
+        now = datetime.now().isoformat()
+        with self.conn:
+            for r in results:
+                if 'error' in r:
+                    continue
+                text = r.get('text', r.get('full_text'))
+                cursor = self.conn.execute(
+                    'INSERT INTO results (run_id, url, host, type, label, value, text, change, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (run_id, r['url'], urlparse(r['url']).netloc, r.get('type'), r.get('label'),
+                     r.get('value'), text, r.get('change'), now)
+                )
+                if self.fts:
+                    self.conn.execute(
+                        'INSERT INTO results_fts (rowid, label, value, text) VALUES (?, ?, ?, ?)',
+                        (cursor.lastrowid, r.get('label'), r.get('value'), text)
+                    )
+
+    def query(self, type: Optional[str] = None, label: Optional[str] = None,
+              url: Optional[str] = None, host: Optional[str] = None,
+              text: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Consulta resultados por tipo, rótulo, URL, host e/ou texto"""
+        where, params = [], []
+        if type:
+            where.append('r.type = ?')
+            params.append(type)
+        if label:
+            where.append('r.label = ? COLLATE NOCASE')
+            params.append(label)
+        if url:
+            where.append('r.url = ?')
+            params.append(url)
+        if host:
+            where.append('r.host = ?')
+            params.append(host)
+        if text:
+            if self.fts:
+                where.append('r.id IN (SELECT rowid FROM results_fts WHERE results_fts MATCH ?)')
+                params.append('"' + text.replace('"', '""') + '"')
+            else:
+                # % e _ no texto buscado são literais
+                escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                where.append("(r.value LIKE ? ESCAPE '\\' OR r.text LIKE ? ESCAPE '\\' "
+                             "OR r.label LIKE ? ESCAPE '\\')")
+                params.extend([f'%{escaped}%'] * 3)
+
+        sql = 'SELECT r.*, runs.started_at FROM results r JOIN runs ON runs.id = r.run_id'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY r.id DESC LIMIT ?'
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def close(self):
+        self.conn.close()
+
+
+class WorkQueue(ABC):
+    """Fila de URLs com leases para distribuir o processamento entre vários workers
+
+    Cada tarefa entregue por ``lease`` fica reservada ao worker até expirar.
+    ``ack`` só é aceito com o token do lease vigente, e grava os resultados
+    junto com a confirmação; leases expirados voltam para a fila. Os
+    resultados só saem da fila com ``delete_results``, depois de gravados.
+    """
+
+    def __init__(self, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def put(self, urls: Iterable[str]) -> int:
+        """Enfileira URLs (ignorando as já enfileiradas) e retorna quantas foram adicionadas"""
+
+    @abstractmethod
+    def lease(self, worker_id: str, lease_seconds: float = 300) -> Optional[Dict[str, Any]]:
+        """Reserva a próxima tarefa disponível"""
+
+    @abstractmethod
+    def ack(self, task: Dict[str, Any], results: List[Dict[str, Any]]) -> bool:
+        """Conclui a tarefa e grava seus resultados; False se o lease foi perdido"""
+
+    @abstractmethod
+    def fail(self, task: Dict[str, Any], error: str) -> bool:
+        """Devolve a tarefa à fila (ou a marca como falha após max_attempts)"""
+
+    @abstractmethod
+    def reclaim_expired(self) -> int:
+        """Devolve à fila as tarefas com lease expirado"""
+
+    @abstractmethod
+    def read_results(self, limit: int = 1000) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Lê, sem remover, um lote de resultados já confirmados como pares (id, resultado)"""
+
+    @abstractmethod
+    def delete_results(self, ids: List[Any]):
+        """Remove da fila os resultados já gravados em outro lugar"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Quantidade de tarefas por status"""
+
+    def close(self):
+        pass
+
+
+class MemoryWorkQueue(WorkQueue):
+    """Fila local em memória, usada nos testes (não é compartilhada entre processos)"""
+
+    def __init__(self, max_attempts: int = 3):
+        super().__init__(max_attempts)
+        self.lock = threading.Lock()
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.pending: List[str] = []
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self.result_ids = itertools.count(1)
+
+    def put(self, urls: Iterable[str]) -> int:
+        added = 0
+        with self.lock:
+            for url in urls:
+                if url not in self.tasks:
+                    self.tasks[url] = {'status': 'pending', 'attempts': 0, 'token': None, 'expires': 0}
+                    self.pending.append(url)
+                    added += 1
+        return added
+
+    def _reclaim(self, now: float) -> int:
+        reclaimed = 0
+        for url, task in self.tasks.items():
+            if task['status'] == 'leased' and task['expires'] < now:
+                task['token'] = None
+                if task['attempts'] >= self.max_attempts:
+                    task['status'] = 'failed'
+                else:
+                    task['status'] = 'pending'
+                    self.pending.append(url)
+                reclaimed += 1
+        return reclaimed
+
+    def reclaim_expired(self) -> int:
+        with self.lock:
+            return self._reclaim(time.time())
+
+    def lease(self, worker_id: str, lease_seconds: float = 300) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            now = time.time()
+            self._reclaim(now)
+            if not self.pending:
+                return None
+            url = self.pending.pop(0)
+            task = self.tasks[url]
+            task.update(status='leased', token=uuid.uuid4().hex, worker=worker_id,
+                        expires=now + lease_seconds, attempts=task['attempts'] + 1)
+            return {'id': url, 'url': url, 'token': task['token']}
+
+    def ack(self, task: Dict[str, Any], results: List[Dict[str, Any]]) -> bool:
+        with self.lock:
+            current = self.tasks.get(task['id'])
+            if not current or current['status'] != 'leased' or current['token'] != task['token']:
+                return False
+            current.update(status='done', token=None)
+            for result in results:
+                self.results[next(self.result_ids)] = result
+            return True
+
+    def fail(self, task: Dict[str, Any], error: str) -> bool:
+        with self.lock:
+            current = self.tasks.get(task['id'])
+            if not current or current['status'] != 'leased' or current['token'] != task['token']:
+                return False
+            current.update(token=None, error=error)
+            if current['attempts'] >= self.max_attempts:
+                current['status'] = 'failed'
+            else:
+                current['status'] = 'pending'
+                self.pending.append(task['id'])
+            return True
+
+    def read_results(self, limit: int = 1000) -> List[Tuple[Any, Dict[str, Any]]]:
+        with self.lock:
+            return list(itertools.islice(self.results.items(), limit))
+
+    def delete_results(self, ids: List[Any]):
+        with self.lock:
+            for result_id in ids:
+                self.results.pop(result_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+            for task in self.tasks.values():
+                counts[task['status']] += 1
+            return counts
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Fila em um arquivo SQLite compartilhado entre os workers da mesma máquina
+
+    O bloqueio de arquivos do SQLite não é confiável em compartilhamentos de
+    rede (NFS/SMB); para workers em máquinas diferentes use o Redis.
+    """
+
+    def __init__(self, path: str = 'fila.db', max_attempts: int = 3):
+        super().__init__(max_attempts)
+        # Transações controladas manualmente (BEGIN IMMEDIATE) para serializar os leases
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE,
+                status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT, token TEXT, lease_expires REAL, error TEXT);
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires);
+            CREATE TABLE IF NOT EXISTS task_results (
+                id INTEGER PRIMARY KEY, task_id INTEGER NOT NULL, result TEXT NOT NULL);
+        ''')
+
+    def put(self, urls: Iterable[str]) -> int:
+        added = 0
+        batch = []
+        for url in urls:
+            batch.append((url,))
+            if len(batch) >= 1000:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return added
+
+    @contextmanager
+    def _transaction(self):
+        """Transação de escrita (BEGIN IMMEDIATE), desfeita em caso de erro"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def _insert(self, batch: List[tuple]) -> int:
+        with self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany('INSERT OR IGNORE INTO tasks (url) VALUES (?)', batch)
+            return self.conn.total_changes - before
+
+    def _reclaim(self, now: float) -> int:
+        cursor = self.conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "token = NULL WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now)
+        )
+        return cursor.rowcount
+
+    def reclaim_expired(self) -> int:
+        with self._transaction():
+            return self._reclaim(time.time())
+
+    def lease(self, worker_id: str, lease_seconds: float = 300) -> Optional[Dict[str, Any]]:
+        with self._transaction():
+            now = time.time()
+            self._reclaim(now)
+            row = self.conn.execute(
+                "SELECT id, url FROM tasks WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            token = uuid.uuid4().hex
+            self.conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, token = ?, "
+                "lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker_id, token, now + lease_seconds, row[0])
+            )
+            return {'id': row[0], 'url': row[1], 'token': token}
+
+    def ack(self, task: Dict[str, Any], results: List[Dict[str, Any]]) -> bool:
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE tasks SET status = 'done', token = NULL "
+                "WHERE id = ? AND token = ? AND status = 'leased'",
+                (task['id'], task['token'])
+            )
+            if cursor.rowcount == 0:
+                return False
+            self.conn.executemany(
+                'INSERT INTO task_results (task_id, result) VALUES (?, ?)',
+                [(task['id'], json.dumps(r, ensure_ascii=False)) for r in results]
+            )
+            return True
+
+    def fail(self, task: Dict[str, Any], error: str) -> bool:
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "token = NULL, error = ? WHERE id = ? AND token = ? AND status = 'leased'",
+                (self.max_attempts, error, task['id'], task['token'])
+            )
+            return cursor.rowcount > 0
+
+    def read_results(self, limit: int = 1000) -> List[Tuple[Any, Dict[str, Any]]]:
+        rows = self.conn.execute(
+            'SELECT id, result FROM task_results ORDER BY id LIMIT ?', (limit,)
+        ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def delete_results(self, ids: List[Any]):
+        with self._transaction():
+            self.conn.executemany('DELETE FROM task_results WHERE id = ?', [(i,) for i in ids])
+
+    def stats(self) -> Dict[str, int]:
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        for status, count in self.conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status'):
+            counts[status] = count
+        return counts
+
+    def close(self):
+        self.conn.close()
+
+
+class RedisWorkQueue(WorkQueue):
+    """Fila em um servidor Redis (ou compatível), com operações atômicas em Lua"""
+
+    PUT_SCRIPT = """
+    local added = 0
+    for _, url in ipairs(ARGV) do
+        if redis.call('SADD', KEYS[1], url) == 1 then
+            redis.call('RPUSH', KEYS[2], url)
+            added = added + 1
+        end
+    end
+    return added
+    """
+
+    LEASE_SCRIPT = """
+    local url = redis.call('LPOP', KEYS[1])
+    if not url then return false end
+    redis.call('ZADD', KEYS[2], ARGV[1], url)
+    redis.call('HSET', KEYS[3], url, ARGV[2])
+    redis.call('HINCRBY', KEYS[4], url, 1)
+    return url
+    """
+
+    RECLAIM_SCRIPT = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    for _, url in ipairs(expired) do
+        redis.call('ZREM', KEYS[1], url)
+        redis.call('HDEL', KEYS[2], url)
+        if tonumber(redis.call('HGET', KEYS[3], url) or '0') >= tonumber(ARGV[2]) then
+            redis.call('SADD', KEYS[5], url)
+        else
+            redis.call('RPUSH', KEYS[4], url)
+        end
+    end
+    return #expired
+    """
+
+    FINISH_SCRIPT = """
+    if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then return 0 end
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    if ARGV[3] == 'done' then
+        redis.call('SADD', KEYS[3], ARGV[1])
+        for i = 5, #ARGV do redis.call('XADD', KEYS[5], '*', 'result', ARGV[i]) end
+    elseif tonumber(redis.call('HGET', KEYS[6], ARGV[1]) or '0') >= tonumber(ARGV[4]) then
+        redis.call('SADD', KEYS[4], ARGV[1])
+    else
+        redis.call('RPUSH', KEYS[7], ARGV[1])
+    end
+    return 1
+    """
+
+    def __init__(self, url: str, prefix: str = 'scraper', max_attempts: int = 3):
+        super().__init__(max_attempts)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("O pacote 'redis' é necessário para usar uma fila Redis (pip install redis)")
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.keys = {name: f'{prefix}:{name}' for name in
+                     ('urls', 'pending', 'leases', 'tokens', 'attempts', 'done', 'failed', 'results')}
+        self._put = self.redis.register_script(self.PUT_SCRIPT)
+        self._lease = self.redis.register_script(self.LEASE_SCRIPT)
+        self._reclaim = self.redis.register_script(self.RECLAIM_SCRIPT)
+        self._finish = self.redis.register_script(self.FINISH_SCRIPT)
+
+    def put(self, urls: Iterable[str]) -> int:
+        # Registro e enfileiramento atômicos, em lotes de 1000 URLs por chamada
+        added = 0
+        urls = iter(urls)
+        while True:
+            batch = list(itertools.islice(urls, 1000))
+            if not batch:
+                return added
+            added += self._put(keys=[self.keys['urls'], self.keys['pending']], args=batch)
+
+    def reclaim_expired(self) -> int:
+        k = self.keys
+        return self._reclaim(keys=[k['leases'], k['tokens'], k['attempts'], k['pending'], k['failed']],
+                             args=[time.time(), self.max_attempts])
+
+    def lease(self, worker_id: str, lease_seconds: float = 300) -> Optional[Dict[str, Any]]:
+        self.reclaim_expired()
+        k = self.keys
+        token = f'{worker_id}:{uuid.uuid4().hex}'
+        url = self._lease(keys=[k['pending'], k['leases'], k['tokens'], k['attempts']],
+                          args=[time.time() + lease_seconds, token])
+        if not url:
+            return None
+        return {'id': url, 'url': url, 'token': token}
+
+    def _finish_task(self, task: Dict[str, Any], status: str, payload: List[str]) -> bool:
+        k = self.keys
+        return bool(self._finish(
+            keys=[k['leases'], k['tokens'], k['done'], k['failed'], k['results'], k['attempts'], k['pending']],
+            args=[task['id'], task['token'], status, self.max_attempts] + payload
+        ))
+
+    def ack(self, task: Dict[str, Any], results: List[Dict[str, Any]]) -> bool:
+        return self._finish_task(task, 'done', [json.dumps(r, ensure_ascii=False) for r in results])
+
+    def fail(self, task: Dict[str, Any], error: str) -> bool:
+        return self._finish_task(task, 'failed', [])
+
+    def read_results(self, limit: int = 1000) -> List[Tuple[Any, Dict[str, Any]]]:
+        rows = self.redis.xrange(self.keys['results'], count=limit)
+        return [(entry_id, json.loads(fields['result'])) for entry_id, fields in rows]
+
+    def delete_results(self, ids: List[Any]):
+        if ids:
+            self.redis.xdel(self.keys['results'], *ids)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': self.redis.llen(self.keys['pending']),
+            'leased': self.redis.zcard(self.keys['leases']),
+            'done': self.redis.scard(self.keys['done']),
+            'failed': self.redis.scard(self.keys['failed']),
+        }
+
+    def close(self):
+        self.redis.close()
+
+
+def is_memory_queue(spec: str) -> bool:
+    return spec == ':memory:' or spec.startswith('file::memory:')
+
+
+def open_work_queue(spec: str) -> WorkQueue:
+    """Abre a fila indicada: redis://... ou caminho de um arquivo SQLite
+
+    Filas em memória não são aceitas: cada processo teria a sua, vazia.
+    ``MemoryWorkQueue`` existe só para os testes.
+    """
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisWorkQueue(spec)
+    if is_memory_queue(spec):
+        raise ValueError("A fila precisa ser compartilhada entre processos: use um arquivo SQLite ou redis://")
+    return SQLiteWorkQueue(spec)
+
+
+class UserAgentCache:
+    """Lista de user agents salva em disco, atualizada pelo fake_useragent quando expira"""
+
+    FALLBACK = [
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    ]
+
+    def __init__(self, path: str = 'user_agents.json', max_age_days: int = 30):
+        self.path = path
+        self.max_age = max_age_days * 86400
+        self.agents = None
+
+    def _load(self) -> List[str]:
+        """Lê a lista salva; se não existir ou estiver velha, gera uma nova"""
+        try:
+            if time.time() - os.path.getmtime(self.path) < self.max_age:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    agents = json.load(f)
+                if agents:
+                    return agents
+        except (OSError, ValueError):
+            pass
+        return self._refresh()
+
+    def _refresh(self) -> List[str]:
+        """Gera a lista com o fake_useragent e salva em disco"""
+        try:
+            from fake_useragent import UserAgent
+            user_agent = UserAgent()
+            agents = sorted({user_agent.random for _ in range(50)})
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(agents, f, indent=2)
+            return agents
+        except Exception as e:
+            logging.warning(f"Usando lista padrão de user agents: {str(e)}")
+            return list(self.FALLBACK)
+
+    @property
+    def random(self) -> str:
+        if self.agents is None:
+            self.agents = self._load()
+        return random.choice(self.agents)
+
+
+class EvidenceArchiver:
+    """Arquiva evidências de cada página: screenshot, PDF, MHTML e downloads
+
+    As capturas entram em uma fila limitada e são compactadas e gravadas por
+    um pool de tarefas escritoras, fora do loop de scraping. O armazenamento é
+    endereçado por conteúdo (SHA-256): capturas idênticas ocupam espaço uma
+    única vez, e ``manifesto.jsonl`` liga cada URL aos seus arquivos.
+    """
+
+    KINDS = ('screenshot', 'pdf', 'mhtml')
+
+    def __init__(self, root: str = 'evidencias', kinds: Iterable[str] = ('screenshot',),
+                 writers: int = 2, queue_size: int = 16, jpeg_quality: int = 70):
+        self.root = root
+        self.kinds = [kind for kind in kinds if kind in self.KINDS]
+        self.writers = writers
+        self.queue_size = queue_size
+        self.jpeg_quality = jpeg_quality
+        self.manifest_lock = threading.Lock()
+        self.queue = None
+        self.tasks = []
+        self.downloads = set()
+        os.makedirs(os.path.join(root, 'objetos'), exist_ok=True)
+
+    async def start(self):
+        """Inicia as tarefas escritoras"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.tasks = [asyncio.ensure_future(self._writer()) for _ in range(self.writers)]
+
+    async def _capture(self, page, kind: str) -> Tuple[bytes, str, bool]:
+        """Retorna (conteúdo, extensão, se deve ser compactado com gzip)"""
+        if kind == 'screenshot':
+            data = await page.screenshot(full_page=True, type='jpeg', quality=self.jpeg_quality)
+            return data, 'jpg', False
+        if kind == 'pdf':
+            # Disponível apenas no Chromium em modo headless
+            return await page.pdf(), 'pdf', True
+        cdp = await page.context.new_cdp_session(page)
+        try:
+            snapshot = await cdp.send('Page.captureSnapshot', {'format': 'mhtml'})
+        finally:
+            await cdp.detach()
+        return snapshot['data'].encode('utf-8'), 'mhtml', True
+
+    async def capture(self, page, url: str):
+        """Captura a página e enfileira para gravação (aguarda se a fila estiver cheia)"""
+        for kind in self.kinds:
+            try:
+                data, ext, compress = await self._capture(page, kind)
+            except Exception as e:
+                logging.warning(f"Não foi possível capturar {kind} de {url}: {str(e)}")
+                continue
+            await self.queue.put((url, kind, data, ext, compress))
+
+    def on_download(self, download):
+        """Handler do evento 'download' da página"""
+        task = asyncio.ensure_future(self._archive_download(download))
+        self.downloads.add(task)
+        task.add_done_callback(self.downloads.discard)
+
+    async def _archive_download(self, download):
+        url = download.page.url
+        try:
+            path = await download.path()
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, self._read_file, path)
+            ext = os.path.splitext(download.suggested_filename)[1].lstrip('.') or 'bin'
+            await self.queue.put((url, 'download', data, ext, True))
+        except Exception as e:
+            logging.warning(f"Não foi possível arquivar download de {url}: {str(e)}")
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is None:
+                    return
+                await loop.run_in_executor(None, self._store, *item)
+            except Exception as e:
+                logging.error(f"Erro ao gravar evidência: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    def _store(self, url: str, kind: str, data: bytes, ext: str, compress: bool):
+        """Grava o conteúdo (se ainda não existir) e registra no manifesto"""
+        digest = hashlib.sha256(data).hexdigest()
+        relative = os.path.join('objetos', digest[:2], f"{digest}.{ext}{'.gz' if compress else ''}")
+        path = os.path.join(self.root, relative)
+        deduplicated = os.path.exists(path)
+        if not deduplicated:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            payload = gzip.compress(data) if compress else data
+            temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        
+        entry = {
+            'url': url,
+            'kind': kind,
+            'sha256': digest,
+            'path': relative,
+            'size': len(data),
+            'deduplicated': deduplicated,
+            'captured_at': datetime.now().isoformat()
+        }
+        with self.manifest_lock:
+            with open(os.path.join(self.root, 'manifesto.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    async def close(self):
+        """Espera os downloads e a fila esvaziarem e encerra as escritoras"""
+        if self.downloads:
+            await asyncio.gather(*self.downloads, return_exceptions=True)
+        for _ in self.tasks:
+            await self.queue.put(None)
+        await asyncio.gather(*self.tasks)
+        self.tasks = []
+
+
+def resource_usage() -> Optional[Tuple[float, float]]:
+    """Uso de CPU da máquina (%) e memória (MB) deste processo e dos navegadores filhos
+
+    Retorna None sem o pacote ``psutil``: sem ele não há como medir os
+    processos do navegador, que são os que mais consomem memória.
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    process = psutil.Process()
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return psutil.cpu_percent(interval=None), rss / (1024 * 1024)
+
+
+class ConcurrencyTuner:
+    """Ajusta o número de páginas ativas conforme vazão, latência, erros, CPU e memória
+
+    A cada intervalo, reduz o limite pela metade se a taxa de erros, a
+    latência média, a CPU ou a memória passarem dos tetos; aumenta uma página
+    quando todas estão ocupadas e a vazão continua crescendo; e diminui uma
+    página quando a vazão cai. Cada decisão vai para o log e para
+    ``autoajuste.jsonl``.
+    """
+
+    def __init__(self, min_pages: int = 1, max_pages: int = 8, start_pages: int = 2,
+                 interval: float = 15.0, max_cpu: float = 85.0, max_rss_mb: float = 4096,
+                 max_error_rate: float = 0.2, max_latency: float = 60.0,
+                 log_path: Optional[str] = 'autoajuste.jsonl'):
+        self.min_pages = max(1, min_pages)
+        self.max_pages = max(self.min_pages, max_pages)
+        self.limit = min(max(start_pages, self.min_pages), self.max_pages)
+        self.interval = interval
+        self.max_cpu = max_cpu
+        self.max_rss_mb = max_rss_mb
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.log_path = log_path
+        self.active = 0
+        self.samples: List[Tuple[float, bool]] = []
+        self.saturated = False
+        self.last_throughput = None
+        self.window_start = time.monotonic()
+        self.condition = None
+        self.task = None
+
+    async def start(self):
+        """Inicia o ciclo de ajuste"""
+        self.condition = asyncio.Condition()
+        self.window_start = time.monotonic()
+        # A primeira leitura de CPU do psutil serve só de referência
+        if resource_usage() is None:
+            logging.warning("psutil não instalado: tetos de CPU e memória do autoajuste desativados "
+                            "(pip install psutil)")
+        self.task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def acquire(self):
+        """Espera uma vaga dentro do limite atual de páginas ativas"""
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            if self.active >= self.limit:
+                self.saturated = True
+
+    async def release(self, latency: Optional[float] = None, ok: bool = True):
+        """Libera a vaga e registra a latência e o resultado da página, se houver"""
+        async with self.condition:
+            self.active -= 1
+            if latency is not None:
+                self.samples.append((latency, ok))
+            self.condition.notify_all()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            async with self.condition:
+                self.adjust()
+                self.condition.notify_all()
+
+    def adjust(self) -> Dict[str, Any]:
+        """Avalia o último intervalo e decide o novo limite"""
+        now = time.monotonic()
+        elapsed = max(now - self.window_start, 1e-6)
+        samples, self.samples = self.samples, []
+        saturated, self.saturated = self.saturated, self.active >= self.limit
+        self.window_start = now
+        
+        cpu, rss_mb = resource_usage() or (None, None)
+        throughput = len(samples) / elapsed
+        errors = sum(1 for _, ok in samples if not ok)
+        error_rate = errors / len(samples) if samples else 0.0
+        latency = sum(latency for latency, _ in samples) / len(samples) if samples else 0.0
+        
+        previous = self.limit
+        reason = 'sem alteração'
+        if cpu is not None and cpu > self.max_cpu:
+            reason = f'CPU acima de {self.max_cpu:.0f}%'
+        elif rss_mb is not None and rss_mb > self.max_rss_mb:
+            reason = f'memória acima de {self.max_rss_mb:.0f} MB'
+        elif error_rate > self.max_error_rate:
+            reason = f'taxa de erros acima de {self.max_error_rate:.0%}'
+        elif latency > self.max_latency:
+            reason = f'latência média acima de {self.max_latency:.0f}s'
+        
+        if reason != 'sem alteração':
+            self.limit = max(self.min_pages, self.limit // 2)
+        elif samples and self.last_throughput is not None:
+            if throughput < self.last_throughput * 0.8 and self.limit > self.min_pages:
+                self.limit -= 1
+                reason = 'vazão caiu'
+            elif saturated and throughput >= self.last_throughput * 0.95 and self.limit < self.max_pages:
+                self.limit += 1
+                reason = 'vazão crescendo com todas as páginas ocupadas'
+        elif samples and saturated and self.limit < self.max_pages:
+            self.limit += 1
+            reason = 'todas as páginas ocupadas'
+        if samples:
+            self.last_throughput = throughput
+        
+        decision = {
+            'time': datetime.now().isoformat(),
+            'previous_limit': previous,
+            'limit': self.limit,
+            'reason': reason,
+            'active': self.active,
+            'pages_per_minute': round(throughput * 60, 2),
+            'avg_latency': round(latency, 2),
+            'error_rate': round(error_rate, 3),
+            'cpu': round(cpu, 1) if cpu is not None else None,
+            'rss_mb': round(rss_mb, 1) if rss_mb is not None else None
+        }
+        if self.limit != previous:
+            resources = f", CPU {decision['cpu']}%, {decision['rss_mb']} MB" if cpu is not None else ''
+            logging.info(f"Autoajuste: {previous} -> {self.limit} páginas ({reason}; "
+                         f"{decision['pages_per_minute']} págs/min, latência {decision['avg_latency']}s, "
+                         f"erros {decision['error_rate']:.0%}{resources})")
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(decision, ensure_ascii=False) + '\n')
+        return decision
+
+
 class WebScraper:
     def __init__(self):
-        self.user_agent = UserAgent()
+        self.user_agent = UserAgentCache()
         self.session = None
+        self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
+        self.sessions = None
+        self.fingerprints = None
+        self.profiles = ExtractionProfiles()
+        self.archiver = None
+        self.snapshots = None
+        self.launch_options = None
         self.results = []
         
-    async def initialize(self, browser_type: str, headless: bool = True):
+    def is_running(self) -> bool:
+        """Indica se há um navegador aberto de uma execução anterior"""
+        return bool(self.browser and self.browser.is_connected())
+        
+    async def is_alive(self) -> bool:
+        """Confirma que o navegador mantido aberto ainda responde
+
+        Com o loop parado entre execuções, o fechamento da janela pelo usuário só
+        é percebido quando o loop volta a rodar; por isso a página é consultada.
+        """
+        await asyncio.sleep(0)
+        if not self.is_running() or not self.page or self.page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(self.page.evaluate('() => 1'), timeout=5)
+            return True
+        except Exception:
+            return False
+        
+    async def initialize(self, browser_type: str, headless: bool = True, reuse_sessions: bool = False):
         """Inicializa o browser com configurações profissionais"""
         try:
-            playwright = await async_playwright().start()
-            browser_options = {
-                'chrome': playwright.chromium,
-                'firefox': playwright.firefox,
-                'msedge': playwright.chromium
-            }
-            
-            self.browser = await browser_options[browser_type].launch(
-                headless=headless,
-                args=[
-                    '--disable-dev-shm-usage',
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-accelerated-2d-canvas',
-                    '--disable-gpu'
-                ]
-            )
-            
-            # Configurar contexto com user agent aleatório
-            self.context = await self.browser.new_context(
-                user_agent=self.user_agent.random,
-                viewport={'width': 1920, 'height': 1080},
-                java_script_enabled=True
-            )
-            
-            # Configurar interceptação de requests
-            await self.context.route("**/*", self.route_interceptor)
+            # Reaproveitar o navegador mantido aberto, se as opções forem as mesmas
+            if self.launch_options == (browser_type, headless) and await self.is_alive():
+                logging.info("Reutilizando navegador já aberto")
+            else:
+                if self.browser:
+                    await self.close()
+                await self.launch(browser_type, headless)
             
-            self.page = await self.context.new_page()
-            await self.setup_page_handlers()
+            if reuse_sessions and not self.sessions:
+                self.sessions = SessionPool(self.new_context)
+            elif not reuse_sessions and self.sessions:
+                await self.sessions.close()
+                self.sessions = None
             
         except Exception as e:
             logging.error(f"Erro ao inicializar o browser: {str(e)}")
             raise
             
+    async def launch(self, browser_type: str, headless: bool):
+        """Abre o navegador e a página principal"""
+        self.playwright = playwright = await playwright_api.async_playwright().start()
+        browser_options = {
+            'chrome': playwright.chromium,
+            'firefox': playwright.firefox,
+            'msedge': playwright.chromium
+        }
+        
+        self.browser = await browser_options[browser_type].launch(
+            headless=headless,
+            args=[
+                '--disable-dev-shm-usage',
+                '--no-sandbox',
+                '--disable-setuid-sandbox',
+                '--disable-accelerated-2d-canvas',
+                '--disable-gpu'
+            ]
+        )
+        self.launch_options = (browser_type, headless)
+        
+        self.context = await self.new_context()
+        self.page = await self.context.new_page()
+        await self.setup_page_handlers(self.page)
+            
+    async def new_context(self, storage_state: Optional[str] = None):
+        """Cria um contexto configurado, opcionalmente com uma sessão salva"""
+        # Configurar contexto com user agent aleatório
+        context = await self.browser.new_context(
+            user_agent=self.user_agent.random,
+            viewport={'width': 1920, 'height': 1080},
+            java_script_enabled=True,
+            accept_downloads=True,
+            storage_state=storage_state
+        )
+        
+        # Configurar interceptação de requests
+        await context.route("**/*", self.route_interceptor)
+        return context
+            
     async def route_interceptor(self, route):
         """Intercepta e modifica requests para evitar detecção"""
-        if route.request.resource_type in ['image', 'media', 'font']:
+        resource_type = route.request.resource_type
+        if self.archiver and resource_type in ['image', 'font']:
+            # As evidências precisam mostrar a página como ela é vista
+            await route.continue_()
+        elif resource_type in ['image', 'media', 'font']:
             await route.abort()
         else:
             headers = {
@@ -88,20 +1869,26 @@ class WebScraper:
             }
             await route.continue_(headers=headers)
             
-    async def setup_page_handlers(self):
+    async def setup_page_handlers(self, page):
         """Configura handlers para eventos da página"""
-        await self.page.set_viewport_size({'width': 1920, 'height': 1080})
-        await self.page.set_extra_http_headers({
+        page.on('download', self.handle_download)
+        await page.set_viewport_size({'width': 1920, 'height': 1080})
+        await page.set_extra_http_headers({
             'Accept-Language': 'en-US,en;q=0.9',
             'DNT': '1'
         })
         
+    def handle_download(self, download):
+        """Encaminha downloads disparados pela página para o arquivamento"""
+        if self.archiver:
+            self.archiver.on_download(download)
+        
     async def extract_text_with_context(self, element, custom_terms=None) -> Dict[str, Any]:
         """Extrai texto com contexto melhorado"""
         try:
             text = await element.inner_text()
             html = await element.inner_html()
-            soup = BeautifulSoup(html, 'html.parser')
+            soup = bs4.BeautifulSoup(html, 'html.parser')
             
             # Processar texto após os dois pontos
             if ':' in text:
@@ -127,139 +1914,255 @@ class WebScraper:
         wait_time = random.uniform(min_time, max_time)
         await asyncio.sleep(wait_time)
         
-    async def search_page(self, url: str, search_params: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Realiza busca avançada na página"""
-        try:
-            await self.smart_wait()
-            await self.page.goto(url, wait_until='networkidle', timeout=60000)
-            
-            # Esperar carregamento dinâmico
-            await self.page.wait_for_load_state('domcontentloaded')
-            await asyncio.sleep(2)  # Espera adicional para conteúdo dinâmico
-            
-            results = []
+    async def open_page(self, url: str, page=None):
+        """Retorna a página a usar para a URL e se ela deve ser fechada depois"""
+        if self.sessions:
+            page = await self.sessions.new_page(url)
+            await self.setup_page_handlers(page)
+            return page, True
+        return page or self.page, False
             
-            # Pegar todo o conteúdo da página primeiro
-            page_content = await self.page.content()
-            soup = BeautifulSoup(page_content, 'html.parser')
+    async def iter_page_lines(self, page, pattern: Optional[str] = None,
+                              chunk_size: int = 500) -> AsyncIterator[str]:
+        """Gera as linhas não vazias do texto da página em blocos limitados"""
+        regex = compile_line_filter(pattern)
+        offset = 0
+        while True:
+            lines = await page.evaluate(TEXT_CHUNK_SCRIPT, {'offset': offset, 'limit': chunk_size})
+            for line in lines:
+                if regex is None or regex.search(line):
+                    yield line
+            if len(lines) < chunk_size:
+                break
+            offset += len(lines)
             
-            # Função auxiliar para buscar texto
-            async def search_text(selector: str, text_type: str, search_term: str = None):
-                try:
-                    # Busca por seletor CSS primeiro
-                    elements = await self.page.query_selector_all(selector)
-                    
-                    # Se não encontrar, busca por texto em toda a página
-                    if not elements:
-                        # Usar BeautifulSoup para busca mais flexível
-                        for tag in soup.find_all(text=True):
-                            if search_term:
-                                if search_term.lower() in tag.lower():
-                                    results.append({
-                                        'type': text_type,
-                                        'text': tag.strip(),
-                                        'url': url
-                                    })
-                            else:
-                                results.append({
-                                    'type': text_type,
-                                    'text': tag.strip(),
-                                    'url': url
-                                })
-                    else:
-                        for el in elements:
-                            text = await el.inner_text()
-                            html = await el.inner_html()
-                            
-                            # Extrair texto após os dois pontos se existir
-                            if ':' in text:
-                                label, value = text.split(':', 1)
-                                results.append({
-                                    'type': text_type,
-                                    'label': label.strip(),
-                                    'value': value.strip(),
-                                    'full_text': text.strip(),
-                                    'html': html,
-                                    'url': url
-                                })
-                            else:
-                                results.append({
-                                    'type': text_type,
-                                    'text': text.strip(),
-                                    'html': html,
-                                    'url': url
-                                })
-                            
-                except Exception as e:
-                    logging.error(f"Erro ao buscar {text_type}: {str(e)}")
+    async def load_page(self, page, url: str):
+        """Navega até a URL e espera o conteúdo dinâmico"""
+        await page.goto(url, wait_until='networkidle', timeout=60000)
+        
+        # Refazer login automaticamente se a sessão expirou
+        if self.sessions and await self.sessions.ensure_session(page, url):
+            await page.goto(url, wait_until='networkidle', timeout=60000)
+        
+        # Esperar carregamento dinâmico
+        await page.wait_for_load_state('domcontentloaded')
+        await asyncio.sleep(2)  # Espera adicional para conteúdo dinâmico
+        
+        if self.archiver:
+            await self.archiver.capture(page, url)
             
-            # Busca por tipo de conteúdo
-            if search_params.get('cod', False):
-                await search_text('text="COD" i, text="CÓD" i, text="BANCO" i, [id*="cod" i], [class*="cod" i]', 'cod')
+    async def check_unchanged(self, page, url: str, search_params: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+        """Modo incremental: calcula a impressão da página e diz se ela mudou"""
+        if not self.fingerprints:
+            return False, None
+        digest = FingerprintStore.page_digest(search_params)
+        async for line in self.iter_page_lines(page):
+            digest.update(line.encode('utf-8'))
+            digest.update(b'\n')
+        page_hash = digest.hexdigest()
+        if self.fingerprints.is_unchanged(url, page_hash):
+            logging.info(f"Página sem alterações, ignorada: {url}")
+            return True, page_hash
+        return False, page_hash
             
-            if search_params.get('nome', False):
-                await search_text('text="NOME" i, text="CLIENTE" i, [id*="nome" i], [class*="nome" i]', 'nome')
+    def finish_results(self, url: str, page_hash: Optional[str],
+                       results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """No modo incremental, reduz os resultados às alterações desde a última execução"""
+        if self.fingerprints:
+            return self.fingerprints.diff(url, page_hash, results)
+        return results
             
-            if search_params.get('cpf', False):
-                await search_text('text="CPF" i, text="DOCUMENTO" i, [id*="cpf" i], [class*="cpf" i]', 'cpf')
+    async def save_snapshot(self, page, url: str, html: str):
+        """Guarda o HTML e o texto visível da página para reextração offline"""
+        text = await page.evaluate('() => document.body.innerText')
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.snapshots.add, url, html, text)
             
-            if search_params.get('acordo', False):
-                await search_text('text="ACORDO" i, text="CONTRATO" i, [id*="acordo" i], [class*="acordo" i]', 'acordo')
+    async def fetch_page(self, url: str, search_params: Dict[str, Any], page=None) -> Dict[str, Any]:
+        """Baixa o HTML (e as linhas da busca livre) para extração fora do navegador
+
+        Retorna ``results`` já prontos quando a página não precisa ser extraída
+        (erro ou página inalterada no modo incremental).
+        """
+        owned = False
+        try:
+            await self.smart_wait()
+            page, owned = await self.open_page(url, page)
+            await self.load_page(page, url)
             
-            # Busca personalizada
-            if search_params.get('custom', False) and search_params.get('custom_terms'):
-                for term in search_params['custom_terms']:
-                    term = term.strip()
-                    if term:
-                        # Busca mais flexível para termos personalizados
-                        await search_text(f'*', 'custom', term)
+            unchanged, page_hash = await self.check_unchanged(page, url, search_params)
+            if unchanged:
+                return {'url': url, 'results': []}
             
-            # Busca livre - busca em todo o conteúdo da página
+            lines = []
             if search_params.get('free_search', False):
-                # Pegar todo o texto visível da página
-                page_text = await self.page.evaluate('() => document.body.innerText')
-                
-                # Dividir em linhas e processar cada uma
-                lines = page_text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line:
-                        results.append({
-                            'type': 'free_search',
-                            'text': line,
-                            'url': url
-                        })
-            
-            # Remover duplicatas mantendo a ordem
-            seen = set()
-            unique_results = []
-            for r in results:
-                # Criar uma chave única baseada no tipo e texto
-                key = (r.get('type'), r.get('text', ''), r.get('full_text', ''))
-                if key not in seen:
-                    seen.add(key)
-                    unique_results.append(r)
-            
-            return unique_results
+                async for line in self.iter_page_lines(page, search_params.get('free_search_filter')):
+                    lines.append(line)
+            html = await page.content()
+            if self.snapshots:
+                await self.save_snapshot(page, url, html)
+            return {
+                'url': url,
+                'html': html,
+                'lines': lines,
+                'page_hash': page_hash
+            }
             
         except Exception as e:
             logging.error(f"Erro ao buscar página {url}: {str(e)}")
+            return {'url': url, 'results': [{'error': str(e), 'url': url}]}
+            
+        finally:
+            if owned:
+                await page.close()
+            
+    async def extract(self, fetched: Dict[str, Any], search_params: Dict[str, Any],
+                      executor=None) -> List[Dict[str, Any]]:
+        """Extrai os resultados de uma página baixada por ``fetch_page``
+
+        A extração (``extract_results``) roda no executor indicado ou, sem ele,
+        numa thread, e é a mesma com ou sem a extração paralela.
+        """
+        if 'results' in fetched:
+            return fetched['results']
+        url = fetched['url']
+        host = urlparse(url).netloc
+        try:
+            loop = asyncio.get_running_loop()
+            results, hits, misses = await loop.run_in_executor(
+                executor, extract_results, url, fetched['html'], fetched['lines'],
+                search_params, self.profiles.plan(host))
+            for field, selector in hits:
+                self.profiles.record_hit(host, field, selector)
+            for field, selector in misses:
+                self.profiles.record_miss(host, field, selector)
+            return self.finish_results(url, fetched['page_hash'], results)
+        except Exception as e:
+            logging.error(f"Erro ao extrair página {url}: {str(e)}")
             return [{'error': str(e), 'url': url}]
             
-    async def close(self):
-        """Fecha recursos do scraper"""
-        if self.page:
-            await self.page.close()
-        if self.context:
-            await self.context.close()
-        if self.browser:
-            await self.browser.close()
+    async def search_page(self, url: str, search_params: Dict[str, Any], page=None) -> List[Dict[str, Any]]:
+        """Realiza busca avançada na página"""
+        return await self.extract(await self.fetch_page(url, search_params, page), search_params)
+            
+    async def crawl(self, urls: Iterable[str], search_params: Dict[str, Any],
+                    on_results: Callable[[Any], Awaitable[None]], tuner: ConcurrencyTuner,
+                    fetch_only: bool = False):
+        """Processa as URLs em várias páginas simultâneas, no limite definido pelo tuner
+
+        Com ``fetch_only`` entrega o retorno de ``fetch_page`` em vez dos resultados.
+        """
+        url_iter = iter(urls)
+        
+        async def worker():
+            page = None
+            try:
+                while True:
+                    await tuner.acquire()
+                    url = next(url_iter, None)
+                    if url is None:
+                        await tuner.release()
+                        return
+                    if page is None and not self.sessions:
+                        page = await self.context.new_page()
+                        await self.setup_page_handlers(page)
+                    
+                    started = time.monotonic()
+                    if fetch_only:
+                        item = await self.fetch_page(url, search_params, page)
+                        ok = not any('error' in r for r in item.get('results', []))
+                    else:
+                        item = await self.search_page(url, search_params, page)
+                        ok = not any('error' in r for r in item)
+                    await tuner.release(time.monotonic() - started, ok)
+                    await on_results(item)
+            finally:
+                if page is not None:
+                    await page.close()
+        
+        await tuner.start()
+        try:
+            await asyncio.gather(*(worker() for _ in range(tuner.max_pages)))
+        finally:
+            await tuner.stop()
+            
+    async def close(self, keep_alive: bool = False):
+        """Fecha recursos do scraper (ou só salva as sessões, mantendo o navegador aberto)"""
+        self.profiles.save()
+        if keep_alive and self.is_running():
+            if self.sessions:
+                await self.sessions.save()
+            return
+        try:
+            if self.sessions:
+                await self.sessions.close()
+            if self.page:
+                await self.page.close()
+            if self.context:
+                await self.context.close()
+            if self.browser:
+                await self.browser.close()
+        except Exception as e:
+            # O navegador pode ter sido fechado pelo usuário
+            logging.warning(f"Erro ao fechar o navegador: {str(e)}")
+        self.sessions = None
+        self.page = self.context = self.browser = None
+        self.launch_options = None
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+class ExtractionPipeline:
+    """Sobrepõe a navegação e a extração, que roda em um pool de processos
+
+    A navegação continua no event loop; o HTML baixado entra em uma fila
+    limitada (backpressure) e é extraído por ``extract_results`` em outros
+    processos, enquanto o navegador já carrega a próxima página.
+    """
+
+    def __init__(self, scraper: WebScraper, workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, tuner: Optional[ConcurrencyTuner] = None):
+        self.scraper = scraper
+        self.tuner = tuner
+        self.workers = workers or os.cpu_count() or 2
+        self.queue_size = queue_size or self.workers * 2
+
+    async def run(self, urls: Iterable[str], search_params: Dict[str, Any],
+                  on_results: Callable[[List[Dict[str, Any]]], Awaitable[None]]):
+        """Processa as URLs, entregando os resultados de cada página a on_results"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        
+        async def fetch():
+            try:
+                if self.tuner:
+                    await self.scraper.crawl(urls, search_params, queue.put, self.tuner, fetch_only=True)
+                else:
+                    for url in urls:
+                        await queue.put(await self.scraper.fetch_page(url, search_params))
+            finally:
+                for _ in range(self.workers):
+                    await queue.put(None)
+        
+        async def extract(executor):
+            while True:
+                fetched = await queue.get()
+                if fetched is None:
+                    return
+                await on_results(await self.scraper.extract(fetched, search_params, executor))
+        
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            await asyncio.gather(fetch(), *(extract(executor) for _ in range(self.workers)))
+
 
 class CRMScraperApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Web Scraper Profissional")
         self.scraper = WebScraper()
+        self.input_file = None
+        # Loop persistente: o navegador mantido aberto sobrevive entre execuções
+        self.loop = asyncio.new_event_loop()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Configurar redimensionamento
         self.root.minsize(800, 600)
@@ -307,7 +2210,27 @@ class CRMScraperApp:
         self.show_browser = tk.BooleanVar(value=True)
         ttk.Checkbutton(browser_frame, text="Mostrar navegador", variable=self.show_browser).grid(row=1, column=0, columnspan=2, sticky="w", padx=5)
         self.keep_browser_open = tk.BooleanVar(value=False)
-        ttk.Checkbutton(browser_frame, text="Manter navegador aberto", variable=self.keep_browser_open).grid(row=1, column=2, columnspan=2, sticky="w", padx=5)
+        ttk.Checkbutton(browser_frame, text="Manter navegador aberto", variable=self.keep_browser_open,
+                       command=self.toggle_keep_browser_open).grid(row=1, column=2, columnspan=2, sticky="w", padx=5)
+        self.reuse_sessions = tk.BooleanVar(value=False)
+        ttk.Checkbutton(browser_frame, text="Reutilizar sessão (login salvo)", variable=self.reuse_sessions).grid(row=2, column=0, columnspan=2, sticky="w", padx=5)
+        self.incremental = tk.BooleanVar(value=False)
+        ttk.Checkbutton(browser_frame, text="Modo incremental (apenas alterações)", variable=self.incremental).grid(row=2, column=2, columnspan=2, sticky="w", padx=5)
+        self.parallel_extraction = tk.BooleanVar(value=False)
+        ttk.Checkbutton(browser_frame, text="Extração paralela (múltiplos processos)", variable=self.parallel_extraction).grid(row=3, column=0, columnspan=2, sticky="w", padx=5)
+        self.archive_evidence = tk.BooleanVar(value=False)
+        ttk.Checkbutton(browser_frame, text="Arquivar evidências (screenshots e downloads)", variable=self.archive_evidence).grid(row=3, column=2, columnspan=2, sticky="w", padx=5)
+        self.keep_snapshots = tk.BooleanVar(value=False)
+        ttk.Checkbutton(browser_frame, text="Guardar snapshots do HTML (reextração offline)", variable=self.keep_snapshots).grid(row=4, column=0, columnspan=2, sticky="w", padx=5)
+        
+        # Ajuste automático do número de páginas simultâneas
+        autotune_frame = ttk.Frame(browser_frame)
+        autotune_frame.grid(row=4, column=2, columnspan=2, sticky="w", padx=5)
+        self.autotune = tk.BooleanVar(value=False)
+        ttk.Checkbutton(autotune_frame, text="Ajuste automático de concorrência, até", variable=self.autotune).grid(row=0, column=0, sticky="w")
+        self.max_pages = tk.IntVar(value=8)
+        ttk.Spinbox(autotune_frame, from_=1, to=64, width=4, textvariable=self.max_pages).grid(row=0, column=1, padx=2)
+        ttk.Label(autotune_frame, text="páginas").grid(row=0, column=2, sticky="w")
         
         # Frame para modo de busca
         search_mode_frame = ttk.LabelFrame(main_frame, text="Modo de Busca", padding="5")
@@ -323,6 +2246,14 @@ class CRMScraperApp:
         ttk.Radiobutton(search_mode_frame, text="Busca Livre", variable=self.search_mode, 
                        value="free_search", command=self.toggle_search_mode).grid(row=0, column=2, padx=5)
         
+        # Filtro de linhas da busca livre (regex Python aplicada a cada linha lida)
+        self.free_filter_frame = ttk.Frame(search_mode_frame)
+        self.free_filter_frame.grid(row=1, column=0, columnspan=3, sticky="ew", pady=2)
+        self.free_filter_frame.grid_columnconfigure(1, weight=1)
+        ttk.Label(self.free_filter_frame, text="Filtrar linhas (regex, opcional):").grid(row=0, column=0, sticky="w", padx=5)
+        self.free_search_filter = tk.StringVar()
+        ttk.Entry(self.free_filter_frame, textvariable=self.free_search_filter).grid(row=0, column=1, sticky="ew", padx=5)
+        
         # Frame para entrada de URLs
         self.url_frame = ttk.LabelFrame(main_frame, text="URLs para Busca", padding="5")
         self.url_frame.grid(row=2, column=0, sticky="ew", pady=5)
@@ -397,7 +2328,7 @@ class CRMScraperApp:
         button_frame.grid(row=4, column=0, sticky="ew", pady=10)
         button_frame.grid_columnconfigure((0,1,2), weight=1)
         
-        ttk.Button(button_frame, text="Carregar arquivo .txt", command=self.load_file).grid(row=0, column=0, padx=5)
+        ttk.Button(button_frame, text="Carregar arquivo", command=self.load_file).grid(row=0, column=0, padx=5)
         ttk.Button(button_frame, text="Processar", command=self.process_input).grid(row=0, column=1, padx=5)
         ttk.Button(button_frame, text="Limpar", command=self.clear_fields).grid(row=0, column=2, padx=5)
         
@@ -416,6 +2347,11 @@ class CRMScraperApp:
     def toggle_search_mode(self):
         """Alterna o modo de busca"""
         mode = self.search_mode.get()
+        self.input_file = None
+        if mode == "free_search":
+            self.free_filter_frame.grid()
+        else:
+            self.free_filter_frame.grid_remove()
         if mode == "url_only":
             self.url_base_frame.grid_remove()
             self.url_text.configure(height=8)
@@ -432,6 +2368,26 @@ class CRMScraperApp:
             self.url_text.delete(1.0, tk.END)
             self.url_text.insert(tk.END, "Cole qualquer texto para buscar (URL, número, frase)")
 
+    def toggle_keep_browser_open(self):
+        """Abre o navegador antecipadamente, ou o fecha quando a opção é desmarcada"""
+        try:
+            if self.keep_browser_open.get():
+                self.loop.run_until_complete(self.scraper.initialize(
+                    self.browser_var.get(), not self.show_browser.get(), self.reuse_sessions.get()))
+            elif self.scraper.is_running():
+                self.loop.run_until_complete(self.scraper.close())
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao abrir o navegador: {str(e)}")
+
+    def on_close(self):
+        """Fecha o navegador mantido aberto antes de sair"""
+        try:
+            if self.scraper.is_running():
+                self.loop.run_until_complete(self.scraper.close())
+        finally:
+            self.loop.close()
+            self.root.destroy()
+
     def toggle_advanced_filters(self):
         """Alterna a visibilidade dos filtros avançados"""
         if self.use_advanced_filter.get():
@@ -441,56 +2397,117 @@ class CRMScraperApp:
 
     def clear_fields(self):
         """Limpa todos os campos"""
+        self.input_file = None
         self.url_text.delete(1.0, tk.END)
         self.url_base.set("")
         self.custom_search_text.delete(1.0, tk.END)
         self.result_text.delete(1.0, tk.END)
 
     def load_file(self):
-        """Carrega URLs de um arquivo"""
+        """Seleciona um arquivo de URLs/contratos para leitura sob demanda"""
         filename = filedialog.askopenfilename(
             title="Selecione o arquivo de URLs",
-            filetypes=(("Arquivos de texto", "*.txt"), ("Todos os arquivos", "*.*"))
+            filetypes=(("Arquivos de texto", "*.txt"), ("Arquivos CSV", "*.csv"),
+                       ("Arquivos compactados", "*.gz"), ("Todos os arquivos", "*.*"))
         )
         if filename:
-            try:
-                with open(filename, 'r', encoding='utf-8') as file:
-                    content = file.read()
-                    self.url_text.delete(1.0, tk.END)
-                    self.url_text.insert(tk.END, content)
-            except Exception as e:
-                messagebox.showerror("Erro", f"Erro ao carregar arquivo: {str(e)}")
+            if not os.access(filename, os.R_OK):
+                messagebox.showerror("Erro", "Erro ao carregar arquivo: sem permissão de leitura")
+                return
+            # O conteúdo não passa pelo widget de texto; é lido durante o processamento
+            self.input_file = filename
+            self.url_text.delete(1.0, tk.END)
+            self.url_text.insert(tk.END, self.file_placeholder())
+
+    def file_placeholder(self) -> str:
+        """Texto exibido no lugar do conteúdo de um arquivo carregado"""
+        return f"Arquivo: {self.input_file}\n(lido sob demanda durante o processamento)"
+
+    def get_input_loader(self) -> Optional[InputLoader]:
+        """Retorna o leitor do arquivo carregado, se o campo não foi editado"""
+        if not self.input_file:
+            return None
+        if self.url_text.get(1.0, tk.END).strip() != self.file_placeholder():
+            self.input_file = None
+            return None
+        return InputLoader(self.input_file, self.search_mode.get(), self.url_base.get())
                 
-    async def process_urls(self, urls: List[str], search_params: Dict[str, Any]):
+    async def process_urls(self, urls: Iterable[str], search_params: Dict[str, Any]):
         """Processa URLs com progress bar"""
         results = []
         
         # Inicializar scraper
         browser_type = self.browser_var.get()
         show_browser = self.show_browser.get()
-        await self.scraper.initialize(browser_type, not show_browser)
+        await self.scraper.initialize(browser_type, not show_browser, self.reuse_sessions.get())
+        
+        store = ResultStore()
+        run_id = store.start_run()
+        
+        incremental = search_params.get('incremental', False)
+        diff_file = None
+        if incremental:
+            self.scraper.fingerprints = FingerprintStore()
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            diff_file = open(f'alteracoes_{timestamp}.jsonl', 'a', encoding='utf-8')
+        
+        if self.archive_evidence.get():
+            self.scraper.archiver = EvidenceArchiver()
+            await self.scraper.archiver.start()
+        if self.keep_snapshots.get():
+            self.scraper.snapshots = SnapshotStore()
+        
+        loop = asyncio.get_running_loop()
+        results_file = f"resultados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        # Resultados parciais: cada página é acrescentada ao .jsonl (sem reescrever o
+        # arquivo inteiro); o JSON final é gravado uma vez, no fim da execução
+        stream_file = diff_file or open(f'{results_file}l', 'a', encoding='utf-8')
+        
+        async def handle_results(page_results: List[Dict[str, Any]]):
+            results.extend(page_results)
+            store.add(run_id, page_results)
+            
+            # Uma linha por resultado (no modo incremental, por campo novo/alterado/removido)
+            for result in page_results:
+                stream_file.write(json.dumps(result, ensure_ascii=False) + '\n')
+            stream_file.flush()
         
         try:
-            for url in tqdm(urls, desc="Processando URLs"):
-                # Verificar se URL é válida
-                if not url.startswith(('http://', 'https://')):
-                    url = f'https://{url}'
-                    
-                page_results = await self.scraper.search_page(url, search_params)
-                results.extend(page_results)
-                
-                # Salvar resultados parciais
-                self.save_results(results)
-                
+            # As URLs chegam já validadas (InputLoader ou validate_urls)
+            progress = tqdm.tqdm(urls, desc="Processando URLs")
+            
+            tuner = ConcurrencyTuner(max_pages=self.max_pages.get()) if self.autotune.get() else None
+            if self.parallel_extraction.get():
+                await ExtractionPipeline(self.scraper, tuner=tuner).run(progress, search_params, handle_results)
+            elif tuner:
+                await self.scraper.crawl(progress, search_params, handle_results, tuner)
+            else:
+                for url in progress:
+                    await handle_results(await self.scraper.search_page(url, search_params))
+            
+            if not diff_file:
+                await loop.run_in_executor(None, self.save_results, results, results_file)
+                stream_file.close()
+                os.remove(stream_file.name)
             return results
             
         finally:
-            await self.scraper.close()
+            if self.scraper.archiver:
+                await self.scraper.archiver.close()
+                self.scraper.archiver = None
+            self.scraper.snapshots = None
+            store.close()
+            stream_file.close()
+            if self.scraper.fingerprints:
+                self.scraper.fingerprints.close()
+                self.scraper.fingerprints = None
+            await self.scraper.close(keep_alive=self.keep_browser_open.get())
             
-    def save_results(self, results: List[Dict[str, Any]]):
+    def save_results(self, results: List[Dict[str, Any]], filename: Optional[str] = None):
         """Salva resultados em arquivo JSON"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'resultados_{timestamp}.json'
+        if filename is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f'resultados_{timestamp}.json'
         
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
@@ -498,11 +2515,18 @@ class CRMScraperApp:
     def process_input(self):
         """Processa entrada do usuário"""
         try:
-            # Obter URLs
-            urls = self.get_urls()
-            if not urls:
-                messagebox.showerror("Erro", "Por favor, insira pelo menos uma URL válida")
-                return
+            # Obter URLs (de um arquivo grande, sob demanda, ou do campo de texto)
+            loader = self.get_input_loader()
+            if loader is not None:
+                if self.search_mode.get() == 'url_contract' and not self.url_base.get().strip():
+                    messagebox.showerror("Erro", "Por favor, insira a URL base do sistema")
+                    return
+                urls = loader
+            else:
+                urls, input_summary = self.validate_urls(self.get_urls())
+                if not urls:
+                    messagebox.showerror("Erro", "Por favor, insira pelo menos uma URL válida")
+                    return
                 
             # Construir parâmetros de busca
             search_params = {
@@ -512,16 +2536,25 @@ class CRMScraperApp:
                 'acordo': self.filter_vars['acordo'].get(),
                 'custom': self.filter_vars['custom'].get(),
                 'custom_terms': self.get_custom_terms() if self.filter_vars['custom'].get() else [],
-                'free_search': self.search_mode.get() == 'free_search'
+                'free_search': self.search_mode.get() == 'free_search',
+                'free_search_filter': self.free_search_filter.get().strip(),
+                'incremental': self.incremental.get()
             }
             
+            if search_params['free_search_filter']:
+                try:
+                    compile_line_filter(search_params['free_search_filter'])
+                except re.error as e:
+                    messagebox.showerror("Erro", f"Filtro de linhas inválido: {str(e)}")
+                    return
+            
             # Limpar área de resultados
             self.result_text.delete(1.0, tk.END)
             self.result_text.insert(tk.END, "Iniciando busca...\n\n")
             self.root.update()
             
             # Executar busca de forma assíncrona
-            results = asyncio.run(self.process_urls(urls, search_params))
+            results = self.loop.run_until_complete(self.process_urls(urls, search_params))
             
             # Mostrar resultados na interface
             self.result_text.delete(1.0, tk.END)
@@ -531,14 +2564,25 @@ class CRMScraperApp:
                         self.result_text.insert(tk.END, f"Erro na URL {result['url']}: {result['error']}\n\n")
                     else:
                         self.result_text.insert(tk.END, f"Tipo: {result['type']}\n")
+                        if 'change' in result:
+                            change = {'new': 'novo', 'changed': 'alterado', 'removed': 'removido'}[result['change']]
+                            self.result_text.insert(tk.END, f"Alteração: {change}\n")
+                        if 'previous_value' in result:
+                            self.result_text.insert(tk.END, f"Valor anterior: {result['previous_value']}\n")
                         if 'label' in result and 'value' in result:
                             self.result_text.insert(tk.END, f"Campo: {result['label']}\n")
                             self.result_text.insert(tk.END, f"Valor: {result['value']}\n")
+                        elif 'label' in result:
+                            self.result_text.insert(tk.END, f"Campo: {result['label']}\n")
                         elif 'text' in result:
                             self.result_text.insert(tk.END, f"Texto: {result['text']}\n")
                         self.result_text.insert(tk.END, f"URL: {result['url']}\n\n")
             else:
                 self.result_text.insert(tk.END, "Nenhum resultado encontrado.\n")
+            if loader is not None:
+                input_summary = loader.summary()
+            logging.info(input_summary)
+            self.result_text.insert(tk.END, f"\n{input_summary}\n")
             
         except Exception as e:
             logging.error(f"Erro ao processar entrada: {str(e)}")
@@ -563,6 +2607,19 @@ class CRMScraperApp:
                     
         return urls
         
+    def validate_urls(self, items: List[str]) -> Tuple[List[str], str]:
+        """Normaliza as URLs do campo de texto, registrando as inválidas"""
+        urls = []
+        invalid = 0
+        for item in items:
+            url = normalize_url(item)
+            if url is None:
+                logging.warning(f"URL inválida ignorada: {item}")
+                invalid += 1
+            else:
+                urls.append(url)
+        return urls, f"{len(urls)} URLs lidas do campo de texto ({invalid} inválidas ignoradas)"
+        
     def get_custom_terms(self) -> List[str]:
         """Obtém termos de busca personalizados"""
         text = self.custom_search_text.get(1.0, tk.END).strip()
@@ -570,7 +2627,224 @@ class CRMScraperApp:
             return []
         return [term.strip() for term in text.split(',') if term.strip()]
 
-if __name__ == "__main__":
+async def run_worker(queue: WorkQueue, browser_type: str, search_params: Dict[str, Any],
+                     lease_seconds: float = 300, poll_interval: float = 5.0,
+                     exit_when_empty: bool = False, reuse_sessions: bool = False,
+                     evidence_kinds: Optional[List[str]] = None,
+                     snapshots_dir: Optional[str] = None):
+    """Processa tarefas da fila em modo headless até ela esvaziar (ou indefinidamente)"""
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    scraper = WebScraper()
+    await scraper.initialize(browser_type, True, reuse_sessions)
+    if evidence_kinds:
+        scraper.archiver = EvidenceArchiver(kinds=evidence_kinds)
+        await scraper.archiver.start()
+    if snapshots_dir:
+        scraper.snapshots = SnapshotStore(snapshots_dir)
+    logging.info(f"Worker {worker_id} iniciado")
+    
+    try:
+        while True:
+            task = queue.lease(worker_id, lease_seconds)
+            if task is None:
+                stats = queue.stats()
+                if exit_when_empty and stats['pending'] == 0 and stats['leased'] == 0:
+                    break
+                await asyncio.sleep(poll_interval)
+                continue
+            
+            results = await scraper.search_page(task['url'], search_params)
+            errors = [r['error'] for r in results if 'error' in r]
+            if errors:
+                queue.fail(task, errors[0])
+            elif not queue.ack(task, results):
+                # O lease expirou e a tarefa foi entregue a outro worker
+                logging.warning(f"Lease perdido, resultados descartados: {task['url']}")
+    finally:
+        if scraper.archiver:
+            await scraper.archiver.close()
+        await scraper.close()
+        logging.info(f"Worker {worker_id} finalizado")
+
+
+def search_params_from_args(args) -> Dict[str, Any]:
+    """Monta os parâmetros de busca a partir das opções de linha de comando"""
+    filters = {f.strip() for f in (args.filtros or '').split(',') if f.strip()}
+    terms = [t.strip() for t in (args.termos or '').split(',') if t.strip()]
+    return {
+        'cod': 'cod' in filters,
+        'nome': 'nome' in filters,
+        'cpf': 'cpf' in filters,
+        'acordo': 'acordo' in filters,
+        'custom': bool(terms),
+        'custom_terms': terms,
+        'free_search': args.busca_livre,
+        'free_search_filter': args.filtro_linhas or '',
+        'incremental': False
+    }
+
+
+def line_filter_argument(value: str) -> str:
+    """Valida o filtro de linhas recebido na linha de comando"""
+    try:
+        compile_line_filter(value)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"regex inválida: {e}")
+    return value
+
+
+def queue_argument(value: str) -> str:
+    """Valida a fila recebida na linha de comando"""
+    if is_memory_queue(value):
+        raise argparse.ArgumentTypeError("fila em memória não é compartilhada entre processos; "
+                                         "use um arquivo SQLite ou redis://")
+    return value
+
+
+def add_search_arguments(parser):
+    """Opções de busca compartilhadas pelos subcomandos"""
+    parser.add_argument('--filtros', default='cod', help="Tipos separados por vírgula: cod,nome,cpf,acordo")
+    parser.add_argument('--termos', help="Termos de busca personalizada separados por vírgula")
+    parser.add_argument('--busca-livre', action='store_true', help="Extrai todas as linhas de texto da página")
+    parser.add_argument('--filtro-linhas', type=line_filter_argument, help="Regex para filtrar as linhas da busca livre")
+
+
+def coordinator_command(args):
+    """Enfileira URLs, mostra o andamento e coleta os resultados da fila"""
+    queue = open_work_queue(args.fila)
+    try:
+        if args.arquivo:
+            loader = InputLoader(args.arquivo, args.modo, args.url_base)
+            added = queue.put(loader)
+            logging.info(f"{loader.summary()}; {added} novas tarefas na fila")
+        if args.coletar:
+            store = ResultStore(args.banco)
+            run_id = store.start_run()
+            collected = 0
+            try:
+                while True:
+                    # Só remove da fila depois que o lote foi gravado no banco
+                    batch = queue.read_results()
+                    if not batch:
+                        break
+                    store.add(run_id, [result for _, result in batch])
+                    queue.delete_results([result_id for result_id, _ in batch])
+                    collected += len(batch)
+            finally:
+                store.close()
+            logging.info(f"{collected} resultados coletados em {args.banco}")
+        print(json.dumps(queue.stats()))
+    finally:
+        queue.close()
+
+
+def worker_command(args):
+    """Executa um worker headless ligado à fila"""
+    queue = open_work_queue(args.fila)
+    try:
+        asyncio.run(run_worker(queue, args.navegador, search_params_from_args(args),
+                               lease_seconds=args.lease, exit_when_empty=args.sair_quando_vazia,
+                               reuse_sessions=args.sessoes,
+                               evidence_kinds=[k.strip() for k in (args.evidencias or '').split(',') if k.strip()],
+                               snapshots_dir=args.snapshots))
+    finally:
+        queue.close()
+
+
+def reextract_command(args):
+    """Reextrai os snapshots guardados com os filtros atuais, sem navegador"""
+    snapshots = SnapshotStore(args.snapshots)
+    search_params = search_params_from_args(args)
+    profiles = ExtractionProfiles()
+    store = ResultStore(args.banco)
+    run_id = store.start_run()
+    all_results = []
+    pages = 0
+    
+    jobs = ((snapshot, search_params, profiles.plan(urlparse(snapshot['url']).netloc))
+            for snapshot in snapshots.iter_latest())
+    try:
+        with ProcessPoolExecutor() as executor:
+            # Lotes limitados para não descompactar o arquivo inteiro de uma vez
+            while True:
+                batch = list(itertools.islice(jobs, 256))
+                if not batch:
+                    break
+                for results in executor.map(reextract_snapshot, batch, chunksize=16):
+                    store.add(run_id, results)
+                    pages += 1
+                    if args.saida:
+                        all_results.extend(results)
+    finally:
+        store.close()
+    
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(all_results, f, ensure_ascii=False, indent=2)
+    logging.info(f"{pages} páginas reextraídas de {args.snapshots} para {args.banco}")
+
+
+def query_command(args):
+    """Consulta o banco de resultados pela linha de comando"""
+    store = ResultStore(args.banco)
+    try:
+        for row in store.query(type=args.tipo, label=args.rotulo, url=args.url,
+                               host=args.host, text=args.texto, limit=args.limite):
+            print(json.dumps(row, ensure_ascii=False))
+    finally:
+        store.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Sem argumentos abre a interface gráfica; com subcomando executa via linha de comando"""
+    parser = argparse.ArgumentParser(description="Web Scraper Profissional")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    query_parser = subparsers.add_parser('consulta', help="Consulta o banco de resultados")
+    query_parser.add_argument('--banco', default='resultados.db', help="Arquivo do banco de resultados")
+    query_parser.add_argument('--tipo', help="Tipo do resultado (cod, nome, cpf, acordo, custom, free_search)")
+    query_parser.add_argument('--rotulo', help="Rótulo do campo (texto antes dos dois pontos)")
+    query_parser.add_argument('--url', help="URL exata")
+    query_parser.add_argument('--host', help="Host da URL")
+    query_parser.add_argument('--texto', help="Texto a buscar em rótulo, valor ou texto")
+    query_parser.add_argument('--limite', type=int, default=100, help="Número máximo de resultados")
+    query_parser.set_defaults(func=query_command)
+    
+    coordinator_parser = subparsers.add_parser('coordenador', help="Enfileira URLs e coleta resultados da fila distribuída")
+    coordinator_parser.add_argument('--fila', default='fila.db', type=queue_argument, help="Arquivo SQLite (mesma máquina) ou redis://host:porta/db")
+    coordinator_parser.add_argument('--arquivo', help="Arquivo de URLs/contratos a enfileirar (.txt, .csv, .gz)")
+    coordinator_parser.add_argument('--modo', default='url_only', choices=['url_only', 'url_contract'], help="Conteúdo do arquivo")
+    coordinator_parser.add_argument('--url-base', default='', help="URL base para números de contrato")
+    coordinator_parser.add_argument('--coletar', action='store_true', help="Move os resultados da fila para o banco")
+    coordinator_parser.add_argument('--banco', default='resultados.db', help="Banco de resultados")
+    coordinator_parser.set_defaults(func=coordinator_command)
+    
+    worker_parser = subparsers.add_parser('worker', help="Processa URLs da fila distribuída em modo headless")
+    worker_parser.add_argument('--fila', default='fila.db', type=queue_argument, help="Arquivo SQLite (mesma máquina) ou redis://host:porta/db")
+    worker_parser.add_argument('--navegador', default='chrome', choices=['chrome', 'firefox', 'msedge'])
+    worker_parser.add_argument('--lease', type=float, default=300, help="Segundos até a tarefa voltar para a fila")
+    worker_parser.add_argument('--sessoes', action='store_true', help="Reutiliza sessões salvas em sessoes/")
+    worker_parser.add_argument('--sair-quando-vazia', action='store_true', help="Encerra quando não houver tarefas")
+    worker_parser.add_argument('--evidencias', help="Arquiva evidências por URL: screenshot,pdf,mhtml (inclui downloads)")
+    worker_parser.add_argument('--snapshots', help="Diretório para guardar snapshots do HTML (um por worker)")
+    add_search_arguments(worker_parser)
+    worker_parser.set_defaults(func=worker_command)
+    
+    reextract_parser = subparsers.add_parser('reextrair', help="Reaplica os filtros aos snapshots guardados, sem navegador")
+    reextract_parser.add_argument('--snapshots', default='snapshots', help="Diretório dos snapshots")
+    reextract_parser.add_argument('--banco', default='resultados.db', help="Banco de resultados")
+    reextract_parser.add_argument('--saida', help="Também salva os resultados neste arquivo JSON")
+    add_search_arguments(reextract_parser)
+    reextract_parser.set_defaults(func=reextract_command)
+    
+    args = parser.parse_args(argv)
+    if args.command:
+        args.func(args)
+        return
+    
     root = tk.Tk()
     app = CRMScraperApp(root)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()
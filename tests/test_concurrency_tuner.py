@@ -0,0 +1,82 @@
+import pytest
+
+import main_improved
+from main_improved import ConcurrencyTuner
+
+
+@pytest.fixture
+def usage(monkeypatch):
+    current = {'value': (10.0, 500.0)}
+    monkeypatch.setattr(main_improved, 'resource_usage', lambda: current['value'])
+    return current
+
+
+def make_tuner(limit=4, samples=10, latency=1.0, errors=0, saturated=False, last_throughput=None):
+    tuner = ConcurrencyTuner(min_pages=1, max_pages=8, start_pages=limit, log_path=None)
+    tuner.samples = [(latency, i >= errors) for i in range(samples)]
+    tuner.saturated = saturated
+    tuner.last_throughput = last_throughput
+    return tuner
+
+
+def test_cpu_ceiling_halves_the_limit(usage):
+    usage['value'] = (95.0, 500.0)
+    decision = make_tuner(limit=6, saturated=True).adjust()
+    assert decision['limit'] == 3
+    assert 'CPU' in decision['reason']
+
+
+def test_memory_ceiling_halves_the_limit(usage):
+    usage['value'] = (10.0, 5000.0)
+    assert make_tuner(limit=4).adjust()['limit'] == 2
+
+
+def test_error_rate_halves_the_limit(usage):
+    decision = make_tuner(limit=4, errors=5).adjust()
+    assert decision['limit'] == 2
+    assert decision['error_rate'] == 0.5
+
+
+def test_latency_halves_the_limit(usage):
+    assert make_tuner(limit=4, latency=90.0).adjust()['limit'] == 2
+
+
+def test_halving_never_goes_below_minimum(usage):
+    usage['value'] = (95.0, 500.0)
+    assert make_tuner(limit=1).adjust()['limit'] == 1
+
+
+def test_first_saturated_window_raises_the_limit(usage):
+    decision = make_tuner(limit=2, saturated=True).adjust()
+    assert decision['limit'] == 3
+    assert decision['reason'] == 'todas as páginas ocupadas'
+
+
+def test_growing_throughput_while_saturated_raises_the_limit(usage):
+    tuner = make_tuner(limit=3, saturated=True, last_throughput=0.0)
+    assert tuner.adjust()['limit'] == 4
+
+
+def test_falling_throughput_lowers_the_limit(usage):
+    tuner = make_tuner(limit=3, samples=1, last_throughput=1e9)
+    decision = tuner.adjust()
+    assert decision['limit'] == 2
+    assert decision['reason'] == 'vazão caiu'
+
+
+def test_idle_window_keeps_the_limit(usage):
+    tuner = make_tuner(limit=3, samples=0, saturated=True, last_throughput=1.0)
+    decision = tuner.adjust()
+    assert decision['limit'] == 3
+    assert tuner.last_throughput == 1.0
+
+
+def test_limit_never_exceeds_maximum(usage):
+    assert make_tuner(limit=8, saturated=True).adjust()['limit'] == 8
+
+
+def test_ceilings_are_skipped_without_metrics(monkeypatch):
+    monkeypatch.setattr(main_improved, 'resource_usage', lambda: None)
+    decision = make_tuner(limit=2, saturated=True).adjust()
+    assert decision['limit'] == 3
+    assert decision['cpu'] is None and decision['rss_mb'] is None
@@ -0,0 +1,33 @@
+from main_improved import bs4, element_text, extract_results
+
+PLAN = {'cod': ['#cod'], 'cpf': ['.cpf'], 'nome': ['text="NOME" i'], 'acordo': ['.acordo']}
+
+
+def text_of(html):
+    return element_text(bs4.BeautifulSoup(html, 'html.parser').find())
+
+
+def extract(html, **params):
+    results, _, _ = extract_results('https://crm.exemplo.com/1', html, [], params, PLAN)
+    return results
+
+
+def test_element_text_skips_scripts_and_hidden_elements():
+    html = ('<div>CPF: 123<script>t()</script><style>.x{}</style>'
+            '<span hidden>oculto</span><span style="display: none">x</span></div>')
+    assert text_of(html) == 'CPF: 123'
+
+
+def test_element_text_breaks_lines_between_blocks():
+    assert text_of('<div><p>Cliente:  Ana</p><p>Banco</p>341<br>fim</div>') == 'Cliente: Ana\nBanco\n341\nfim'
+    assert text_of('<table><tr><td>Cód.:</td><td> 341 </td></tr></table>') == 'Cód.:\t341'
+
+
+def test_value_ignores_script_content():
+    results = extract('<div class="cpf">CPF: 123<script>t()</script></div>', cpf=True)
+    assert [(r['label'], r['value']) for r in results] == [('CPF', '123')]
+
+
+def test_text_selector_matches_exact_text():
+    results = extract('<p><b>nome</b></p><p>Nome do cliente</p>', nome=True)
+    assert [r['text'] for r in results] == ['nome']
@@ -0,0 +1,39 @@
+from main_improved import ExtractionProfiles, extract_results
+
+PAGE = '<table><tr><td>COD</td><td id="cod_banco">Cód. banco: 341</td></tr></table>'
+
+
+def make_profiles(tmp_path):
+    return ExtractionProfiles(str(tmp_path / 'perfis.json'), str(tmp_path / 'aprendidos.json'))
+
+
+def extract(profiles, html=PAGE):
+    results, hits, _ = extract_results('https://crm.exemplo.com/1', html, [], {'cod': True},
+                                    profiles.plan('crm.exemplo.com'))
+    for field, selector in hits:
+        profiles.record_hit('crm.exemplo.com', field, selector)
+    return results
+
+
+def test_promotes_the_part_that_yields_label_value(tmp_path):
+    profiles = make_profiles(tmp_path)
+    for _ in range(profiles.promote_after + 2):
+        results = extract(profiles)
+        assert [(r.get('label'), r.get('value')) for r in results if 'value' in r] == [('Cód. banco', '341')]
+    assert profiles.plan('crm.exemplo.com')['cod'][0] == '[id*="cod" i]'
+
+
+def test_label_only_match_is_not_credited(tmp_path):
+    profiles = make_profiles(tmp_path)
+    extract(profiles, '<table><tr><td>COD</td><td>341</td></tr></table>')
+    assert profiles.learned == {}
+
+
+def test_miss_decrements_instead_of_resetting(tmp_path):
+    profiles = make_profiles(tmp_path)
+    for _ in range(profiles.promote_after + 1):
+        profiles.record_hit('crm.exemplo.com', 'cod', '#cod')
+    profiles.record_miss('crm.exemplo.com', 'cod', '#cod')
+    assert profiles.plan('crm.exemplo.com')['cod'][0] == '#cod'
+    profiles.record_miss('crm.exemplo.com', 'cod', '#cod')
+    assert profiles.plan('crm.exemplo.com')['cod'][0] != '#cod'
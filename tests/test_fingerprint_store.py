@@ -0,0 +1,85 @@
+import pytest
+
+from main_improved import FingerprintStore
+
+URL = 'https://crm.exemplo.com/1'
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FingerprintStore(str(tmp_path / 'impressoes.db'))
+    yield store
+    store.close()
+
+
+def field(label, value, type='cod'):
+    return {'type': type, 'label': label, 'value': value, 'full_text': f'{label}: {value}', 'url': URL}
+
+
+def text(value, type='free_search'):
+    return {'type': type, 'text': value, 'url': URL}
+
+
+def summary(changes):
+    return sorted((c['change'], c.get('label', c.get('text')), c.get('value'), c.get('previous_value'))
+                  for c in changes)
+
+
+def test_first_run_reports_everything_as_new(store):
+    changes = store.diff(URL, 'h1', [field('COD', '341'), text('Linha')])
+    assert summary(changes) == [('new', 'COD', '341', None), ('new', 'Linha', None, None)]
+
+
+def test_unchanged_page_is_detected_by_hash(store):
+    store.diff(URL, 'h1', [field('COD', '341')])
+    assert store.is_unchanged(URL, 'h1')
+    assert not store.is_unchanged(URL, 'h2')
+    assert not store.is_unchanged('https://crm.exemplo.com/2', 'h1')
+
+
+def test_new_changed_and_removed_fields(store):
+    store.diff(URL, 'h1', [field('COD', '341'), field('CPF', '1', 'cpf'), text('Antiga')])
+    changes = store.diff(URL, 'h2', [field('COD', '237'), field('Nome', 'Ana', 'nome'), text('Nova')])
+    assert summary(changes) == [
+        ('changed', 'COD', '237', '341'),
+        ('new', 'Nome', 'Ana', None),
+        ('new', 'Nova', None, None),
+        ('removed', 'Antiga', None, None),
+        ('removed', 'CPF', None, '1'),
+    ]
+
+
+def test_same_results_give_no_changes(store):
+    results = [field('COD', '341'), text('Linha')]
+    store.diff(URL, 'h1', results)
+    assert store.diff(URL, 'h2', results) == []
+
+
+def test_repeated_label_changed_in_place(store):
+    store.diff(URL, 'h1', [field('Telefone', '1'), field('Telefone', '2')])
+    changes = store.diff(URL, 'h2', [field('Telefone', '1'), field('Telefone', '3')])
+    assert summary(changes) == [('changed', 'Telefone', '3', '2')]
+
+
+def test_removed_occurrence_does_not_shift_the_others(store):
+    store.diff(URL, 'h1', [field('Telefone', '1'), field('Telefone', '2'), field('Telefone', '3')])
+    changes = store.diff(URL, 'h2', [field('Telefone', '2'), field('Telefone', '3')])
+    assert summary(changes) == [('removed', 'Telefone', None, '1')]
+
+
+def test_added_occurrence_does_not_shift_the_others(store):
+    store.diff(URL, 'h1', [field('Telefone', '2')])
+    changes = store.diff(URL, 'h2', [field('Telefone', '1'), field('Telefone', '2')])
+    assert summary(changes) == [('new', 'Telefone', '1', None)]
+
+
+def test_text_fields_are_never_changed(store):
+    store.diff(URL, 'h1', [text('Saldo 10')])
+    changes = store.diff(URL, 'h2', [text('Saldo 20')])
+    assert summary(changes) == [('new', 'Saldo 20', None, None), ('removed', 'Saldo 10', None, None)]
+
+
+def test_pages_are_tracked_separately(store):
+    store.diff(URL, 'h1', [field('COD', '341')])
+    other = 'https://crm.exemplo.com/2'
+    assert summary(store.diff(other, 'h1', [field('COD', '341')])) == [('new', 'COD', '341', None)]
@@ -0,0 +1,60 @@
+import gzip
+
+from main_improved import InputLoader, normalize_url
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_normalize_url_requires_plausible_host():
+    assert normalize_url('exemplo.com.br/contrato/1') == 'https://exemplo.com.br/contrato/1'
+    assert normalize_url('http://localhost:8000/x') == 'http://localhost:8000/x'
+    assert normalize_url('10.0.0.5/painel') == 'https://10.0.0.5/painel'
+    assert normalize_url('nome') is None
+    assert normalize_url('Joao') is None
+    assert normalize_url('https://exemplo .com') is None
+    assert normalize_url('https://crm_!/x') is None
+
+
+def test_normalize_url_accepts_intranet_hosts():
+    assert normalize_url('http://crm01/cliente?id=1') == 'http://crm01/cliente?id=1'
+    assert normalize_url('crm-interno:8080/x') == 'https://crm-interno:8080/x'
+    assert normalize_url('crm01/cliente') is None
+
+
+def test_multi_column_csv_reads_only_url_column(tmp_path):
+    path = write(tmp_path / 'lista.csv',
+                 'nome,url,obs\n'
+                 'Joao,https://a.exemplo.com/1,12345\n'
+                 'Maria,b.exemplo.com/2,67890\n'
+                 'Jose,,sem url\n')
+    loader = InputLoader(path)
+    assert list(loader) == ['https://a.exemplo.com/1', 'https://b.exemplo.com/2']
+    assert loader.invalid == 0
+
+
+def test_csv_without_known_header_uses_first_column(tmp_path):
+    path = write(tmp_path / 'lista.csv',
+                 'endereco,nome\n'
+                 'a.exemplo.com,Joao\n'
+                 'invalido,Maria\n')
+    loader = InputLoader(path)
+    assert list(loader) == ['https://a.exemplo.com']
+    assert loader.invalid == 1
+
+
+def test_csv_without_header_keeps_first_row(tmp_path):
+    path = write(tmp_path / 'lista.csv', 'a.exemplo.com,x\nb.exemplo.com,y\n')
+    assert list(InputLoader(path)) == ['https://a.exemplo.com', 'https://b.exemplo.com']
+
+
+def test_contract_csv_ignores_numbers_in_other_columns(tmp_path):
+    path = tmp_path / 'contratos.csv.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        file.write('contrato,agencia,valor\n12345,6789,100000\n12345,1111,2000\n123,4444,5000\n')
+    loader = InputLoader(str(path), 'url_contract', 'https://crm.exemplo.com/c/')
+    assert list(loader) == ['https://crm.exemplo.com/c/12345']
+    assert loader.duplicates == 1
+    assert loader.invalid == 1
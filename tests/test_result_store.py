@@ -0,0 +1,59 @@
+import pytest
+
+from main_improved import ResultStore
+
+
+@pytest.fixture(params=['fts', 'like'])
+def store(request, tmp_path):
+    store = ResultStore(str(tmp_path / 'resultados.db'))
+    if request.param == 'like':
+        store.fts = False
+    run_id = store.start_run()
+    store.add(run_id, [
+        {'type': 'cod', 'label': 'Cód. Banco', 'value': '341', 'full_text': 'Cód. Banco: 341',
+         'url': 'https://crm.exemplo.com/1'},
+        {'type': 'cpf', 'label': 'CPF', 'value': '123.456.789-00', 'full_text': 'CPF: 123.456.789-00',
+         'url': 'https://crm.exemplo.com/1'},
+        {'type': 'free_search', 'text': 'Desconto de 10% à vista', 'url': 'https://outro.exemplo.com/2'},
+        {'type': 'free_search', 'text': 'Desconto de 100 reais "especial" OR NOT', 'url': 'https://outro.exemplo.com/2'},
+        {'type': 'free_search', 'text': 'codigo_cliente 7', 'url': 'https://outro.exemplo.com/2'},
+        {'type': 'free_search', 'text': 'codigoXcliente 8', 'url': 'https://outro.exemplo.com/2'},
+        {'error': 'timeout', 'url': 'https://outro.exemplo.com/3'},
+    ])
+    yield store
+    store.close()
+
+
+def texts(rows):
+    return sorted(row['text'] or row['value'] for row in rows)
+
+
+def test_errors_are_not_stored(store):
+    assert len(store.query(limit=100)) == 6
+
+
+def test_label_match_ignores_case(store):
+    rows = store.query(label='cpf')
+    assert [row['value'] for row in rows] == ['123.456.789-00']
+
+
+def test_filters_by_type_host_and_url(store):
+    assert len(store.query(type='free_search')) == 4
+    assert len(store.query(host='crm.exemplo.com')) == 2
+    assert len(store.query(url='https://crm.exemplo.com/1', type='cod')) == 1
+
+
+def test_text_search_is_a_phrase(store):
+    assert texts(store.query(text='"especial" OR NOT')) == ['Desconto de 100 reais "especial" OR NOT']
+    assert texts(store.query(text='123.456')) == ['CPF: 123.456.789-00']
+
+
+def test_like_wildcards_are_literal(store):
+    store.fts = False
+    assert texts(store.query(text='10%')) == ['Desconto de 10% à vista']
+    assert texts(store.query(text='codigo_cliente')) == ['codigo_cliente 7']
+
+
+def test_limit_returns_newest_first(store):
+    rows = store.query(limit=2)
+    assert [row['text'] for row in rows] == ['codigoXcliente 8', 'codigo_cliente 7']
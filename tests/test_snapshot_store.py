@@ -0,0 +1,56 @@
+import os
+
+from main_improved import SnapshotStore
+
+
+def open_store(root, **kwargs):
+    store = SnapshotStore(str(root), **kwargs)
+    # Forçar o zlib, com ou sem o zstandard instalado
+    store.zstd = None
+    store.codec_name = 'zlib'
+    return store
+
+
+def page(i):
+    rows = ''.join(f'<tr><td>Campo {j}</td><td>Valor {i * j}</td></tr>' for j in range(30))
+    return f'<html><body><table>{rows}</table></body></html>'
+
+
+def codecs(store):
+    return {record[4] for record in store._records()}
+
+
+def test_round_trip_with_reopen_and_dictionary(tmp_path):
+    store = open_store(tmp_path, train_after=5)
+    for i in range(10):
+        store.add(f'https://crm.exemplo.com/{i}', page(i), f'texto {i}')
+    assert os.path.exists(tmp_path / 'dicionario.zlib')
+    assert codecs(store) == {SnapshotStore.ZLIB, SnapshotStore.ZLIB_DICT}
+
+    reopened = open_store(tmp_path, train_after=5)
+    reopened.add('https://crm.exemplo.com/10', page(10), 'texto 10')
+    snapshots = {s['url']: s for s in reopened.iter_latest()}
+    assert len(snapshots) == 11
+    for i in range(11):
+        snapshot = snapshots[f'https://crm.exemplo.com/{i}']
+        assert snapshot['html'] == page(i)
+        assert snapshot['text'] == f'texto {i}'
+
+
+def test_latest_snapshot_per_url(tmp_path):
+    store = open_store(tmp_path)
+    store.add('https://crm.exemplo.com/1', page(1), 'antigo')
+    store.add('https://crm.exemplo.com/1', page(2), 'novo')
+    assert len(store) == 2
+    assert [s['text'] for s in store.iter_latest()] == ['novo']
+
+
+def test_same_content_under_two_urls_is_stored_once(tmp_path):
+    store = open_store(tmp_path)
+    store.add('https://crm.exemplo.com/1', page(1), 'texto')
+    size = os.path.getsize(tmp_path / 'dados.bin')
+    store.add('https://crm.exemplo.com/1?aba=2', page(1), 'texto')
+    assert os.path.getsize(tmp_path / 'dados.bin') == size
+    assert len(store.blobs) == 1
+    assert sorted(s['url'] for s in open_store(tmp_path).iter_latest()) == [
+        'https://crm.exemplo.com/1', 'https://crm.exemplo.com/1?aba=2']
@@ -0,0 +1,90 @@
+import pytest
+
+from main_improved import MemoryWorkQueue, SQLiteWorkQueue, WorkQueue, open_work_queue
+
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def queue(request, tmp_path):
+    if request.param == 'memoria':
+        queue = MemoryWorkQueue(max_attempts=2)
+    else:
+        queue = SQLiteWorkQueue(str(tmp_path / 'fila.db'), max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_work_queue_is_abstract():
+    with pytest.raises(TypeError):
+        WorkQueue()
+
+
+def test_open_work_queue_rejects_memory_queue():
+    with pytest.raises(ValueError):
+        open_work_queue(':memory:')
+
+
+def test_put_ignores_duplicates(queue):
+    assert queue.put(['https://a.exemplo.com', 'https://b.exemplo.com']) == 2
+    assert queue.put(['https://a.exemplo.com']) == 0
+    assert queue.stats()['pending'] == 2
+
+
+def test_expired_lease_goes_back_and_stale_ack_is_discarded(queue):
+    queue.put(['https://a.exemplo.com'])
+    stale = queue.lease('w1', lease_seconds=-1)
+    assert queue.reclaim_expired() == 1
+
+    current = queue.lease('w2')
+    assert current['url'] == stale['url']
+    assert queue.ack(stale, [{'url': stale['url'], 'text': 'atrasado'}]) is False
+    assert queue.fail(stale, 'atrasado') is False
+    assert queue.ack(current, [{'url': current['url'], 'text': 'ok'}]) is True
+
+    assert [r['text'] for _, r in queue.read_results()] == ['ok']
+    assert queue.stats() == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}
+
+
+def test_task_fails_after_max_attempts(queue):
+    queue.put(['https://a.exemplo.com'])
+
+    task = queue.lease('w1')
+    assert queue.fail(task, 'erro 1') is True
+    assert queue.stats()['pending'] == 1
+    task = queue.lease('w1')
+    assert queue.fail(task, 'erro 2') is True
+
+    assert queue.lease('w1') is None
+    assert queue.stats()['failed'] == 1
+
+
+def test_expired_lease_counts_as_attempt(queue):
+    queue.put(['https://a.exemplo.com'])
+    queue.lease('w1', lease_seconds=-1)
+    queue.lease('w2', lease_seconds=-1)
+    assert queue.lease('w3') is None
+    assert queue.stats()['failed'] == 1
+
+
+def test_results_stay_until_deleted(queue):
+    queue.put(['https://a.exemplo.com'])
+    task = queue.lease('w1')
+    queue.ack(task, [{'url': task['url'], 'text': str(i)} for i in range(3)])
+
+    first = queue.read_results(limit=2)
+    assert [r['text'] for _, r in first] == ['0', '1']
+    assert len(queue.read_results()) == 3
+
+    queue.delete_results([result_id for result_id, _ in first])
+    assert [r['text'] for _, r in queue.read_results()] == ['2']
+
+
+def test_sqlite_rolls_back_failed_write(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / 'fila.db'))
+    queue.put(['https://a.exemplo.com'])
+    task = queue.lease('w1')
+    with pytest.raises(TypeError):
+        queue.ack(task, [{'url': task['url'], 'valor': object()}])
+    assert not queue.conn.in_transaction
+    assert queue.stats()['leased'] == 1
+    assert queue.ack(task, []) is True
+    queue.close()